@@ -1,17 +1,118 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, send_from_directory
+import contextlib
+import importlib
+import io
+import logging
+import multiprocessing
 import os
-import subprocess
+import signal
+import sys
+import threading
+import traceback
+from functools import lru_cache
 from flask_cors import CORS
+from werkzeug.security import safe_join
 
 app = Flask(__name__)
 CORS(app)
-CLEANING_DIR = os.path.join(os.path.dirname(__file__), 'cleaning')
-OUTPUT_DIR = os.path.join(os.path.dirname(__file__), 'output')
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CLEANING_DIR = os.path.join(BASE_DIR, 'cleaning')
+OUTPUT_DIR = os.path.join(BASE_DIR, 'output')
+SCRIPT_TIMEOUT = 300
+# Scripts that may run at once per server process (each gunicorn worker has its own limit)
+SCRIPT_WORKERS = int(os.environ.get('SCRIPT_WORKERS', 2))
+
+# Every run gets its own process, so a timeout kills exactly that script. They are forked from a
+# forkserver with pandas preloaded (not from the threaded server), so runs still start warm
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+_mp_context = multiprocessing.get_context(_START_METHOD)
+if _START_METHOD == 'forkserver':
+    _mp_context.set_forkserver_preload(['numpy', 'pandas'])
+_script_slots = threading.BoundedSemaphore(SCRIPT_WORKERS)
+
+def _init_worker():
+    # Scripts resolve some paths relative to the project root
+    os.chdir(BASE_DIR)
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    # Scripts log at INFO when run on their own; their basicConfig() is a no-op here
+    # because _run_script_main installs its capture handler first
+    logging.getLogger().setLevel(logging.INFO)
+
+def _run_script_main(script_name):
+    """Run cleaning/<script_name>'s main() inside a script process and capture its output."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    returncode = 0
+    root_logger = logging.getLogger()
+    console_handlers = root_logger.handlers[:]
+    log_handler = logging.StreamHandler(stderr)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    # Log records only go to the captured stderr, not to the server console
+    root_logger.handlers = [log_handler]
+    try:
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            module = importlib.import_module(f"cleaning.{script_name[:-3]}")
+            if module.main() is False:
+                returncode = 1
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc(file=stderr)
+        returncode = 1
+    finally:
+        root_logger.handlers = console_handlers
+    return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'returncode': returncode}
+
+def _script_process(script_name, conn):
+    """Entry point of a script's process: run it and send the result back to the server"""
+    if hasattr(os, 'setpgrp'):
+        # Own process group, so a timeout also stops any worker processes the script starts
+        os.setpgrp()
+    _init_worker()
+    conn.send(_run_script_main(script_name))
+    conn.close()
+
+def _kill_script_process(process):
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    else:
+        process.kill()
+
+def run_script_process(script_name):
+    """Run a script in a process of its own; returns its result, or None if it timed out and was killed"""
+    with _script_slots:
+        receiver, sender = _mp_context.Pipe(duplex=False)
+        process = _mp_context.Process(target=_script_process, args=(script_name, sender))
+        process.start()
+        sender.close()
+        try:
+            if not receiver.poll(SCRIPT_TIMEOUT):
+                _kill_script_process(process)
+                return None
+            try:
+                return receiver.recv()
+            except EOFError:
+                process.join()
+                raise RuntimeError(f'Script process exited with code {process.exitcode} before reporting a result')
+        finally:
+            receiver.close()
+            process.join()
+
+@lru_cache(maxsize=8)
+def _scan_files(directory, mtime_ns, suffix):
+    # mtime_ns is part of the cache key so the listing refreshes when the directory changes
+    with os.scandir(directory) as entries:
+        return [e.name for e in entries if e.name.endswith(suffix) and e.is_file()]
+
+def list_files(directory, suffix=''):
+    return _scan_files(directory, os.stat(directory).st_mtime_ns, suffix)
 
 @app.route('/scripts', methods=['GET'])
 def list_scripts():
-    scripts = [f for f in os.listdir(CLEANING_DIR) if f.endswith('.py')]
-    return jsonify({'scripts': scripts})
+    return jsonify({'scripts': list_files(CLEANING_DIR, '.py')})
 
 @app.route('/run', methods=['POST'])
 def run_script():
@@ -23,33 +124,29 @@ def run_script():
     if not os.path.isfile(script_path):
         return jsonify({'error': 'Script not found'}), 404
     try:
-        result = subprocess.run(['python3', script_path], capture_output=True, text=True, timeout=300)
-        return jsonify({
-            'stdout': result.stdout,
-            'stderr': result.stderr,
-            'returncode': result.returncode
-        })
+        result = run_script_process(script_name)
+        if result is None:
+            return jsonify({'error': f'Script timed out after {SCRIPT_TIMEOUT} seconds'}), 504
+        return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/output/<filename>', methods=['GET'])
 def get_output_file(filename):
-    file_path = os.path.join(OUTPUT_DIR, filename)
-    if not os.path.isfile(file_path):
+    file_path = safe_join(OUTPUT_DIR, filename)
+    if file_path is None or not os.path.isfile(file_path):
         return jsonify({'error': 'File not found'}), 404
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return jsonify({'content': content})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+    # Stream the raw file (with Range/ETag support) instead of loading it into a JSON string
+    return send_from_directory(OUTPUT_DIR, filename, conditional=True)
 
 @app.route('/output-files', methods=['GET'])
 def list_output_files():
     if not os.path.exists(OUTPUT_DIR):
         return jsonify({'files': []})
-    files = [f for f in os.listdir(OUTPUT_DIR) if os.path.isfile(os.path.join(OUTPUT_DIR, f))]
-    return jsonify({'files': files})
+    return jsonify({'files': list_files(OUTPUT_DIR)})
 
+# Development server only; set FLASK_DEBUG=1 for the debugger and reloader.
+# In production serve the app with a WSGI server instead (see README), e.g.
+#   gunicorn -w 2 --timeout 330 backend_api:app
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    app.run()
\ No newline at end of file
@@ -5,6 +5,21 @@ import os
 import glob
 from typing import Optional
 
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:
+    pa = pa_csv = None
+    TEXT_DTYPE = "string"
+
+# The same missing-value markers as pandas, so both readers null out the same cells
+try:
+    from .fill_missing_contacts import NA_VALUES
+except ImportError:
+    # Run as a script: the cleaning directory itself is on sys.path
+    from fill_missing_contacts import NA_VALUES
+
 # Logging 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +37,18 @@ UNUSED_FIELDS = [
     "X_REGION"
 ]
 
+EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+NONDIGIT_RE = re.compile(r"\D+")
+
+# Inputs larger than this are streamed through clean_fields in chunks
+LARGE_INPUT_BYTES = 512 * 1024 * 1024
+CHUNK_ROWS = 200_000
+# Chunk size of the pyarrow reader, which splits on bytes rather than rows
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# Timestamp format of LAST_UPDATED in the contacts export
+LAST_UPDATED_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
 def preserve_integer_values(df: pd.DataFrame) -> pd.DataFrame:
     """Preserve integer values and prevent float conversion for numeric fields, except SUB fields which are nulled."""
     logging.info("🔢 Preserving integer values...")
@@ -54,6 +81,14 @@ def preserve_integer_values(df: pd.DataFrame) -> pd.DataFrame:
     
     return df
 
+def parse_last_updated(dates: pd.Series) -> pd.Series:
+    """Parse LAST_UPDATED with the export's known format, falling back to inference for stragglers."""
+    parsed = pd.to_datetime(dates, format=LAST_UPDATED_FORMAT, errors="coerce", cache=True)
+    retry = parsed.isna() & dates.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(dates[retry], format="mixed", errors="coerce", cache=True)
+    return parsed
+
 def reset_seq_numbers(df: pd.DataFrame) -> pd.DataFrame:
     """Reset SEQ numbers to be in proper descending order (1, 2, 3, 4...)."""
     logging.info("🔄 Resetting SEQ numbers to proper order...")
@@ -89,6 +124,10 @@ def clean_fields(df: pd.DataFrame) -> pd.DataFrame:
     """Clean and standardise all fields in the dataframe."""
     logging.info(f"🧹 Cleaning {len(df)} records with {len(df.columns)} columns...")
 
+    # Convert text columns to StringDtype once so every string pass below is vectorized
+    text_cols = df.select_dtypes("object").columns
+    df[text_cols] = df[text_cols].astype(TEXT_DTYPE)
+
     # Set unused fields to NULL if they exist
     nullified_count = 0
     for field in UNUSED_FIELDS:
@@ -99,56 +138,67 @@ def clean_fields(df: pd.DataFrame) -> pd.DataFrame:
     if nullified_count > 0:
         logging.info(f"✅ Nullified {nullified_count} unused fields")
 
+    # Group columns once by the kind of cleaning they need
+    upper_cols = {col: col.upper() for col in df.columns}
+    email_cols = [col for col, upper in upper_cols.items() if "EMAIL" in upper]
+    phone_cols = [col for col, upper in upper_cols.items() if "PHONE" in upper]
+    name_cols = [col for col, upper in upper_cols.items() if upper in ["FIRSTNAME", "LASTNAME", "FULLNAME", "TITLE"]]
+    address_cols = [col for col, upper in upper_cols.items() if "ADDRESS" in upper or "POST_CODE" in upper]
+
     # Clean email fields
-    email_cols = [col for col in df.columns if "EMAIL" in col.upper()]
-    for col in email_cols:
-        original_count = df[col].notna().sum()
-        df[col] = df[col].astype(str).str.strip().str.lower()
-        df[col] = df[col].apply(lambda x: x if re.match(r"[^@]+@[^@]+\.[^@]+", x) else pd.NA)
-        valid_count = df[col].notna().sum()
-        logging.info(f"📧 Cleaned {col}: {original_count} → {valid_count} valid emails")
+    if email_cols:
+        original_counts = df[email_cols].notna().sum()
+        emails = df[email_cols].astype(TEXT_DTYPE).apply(lambda s: s.str.strip().str.lower())
+        valid = emails.apply(lambda s: s.str.match(EMAIL_RE, na=False))
+        df[email_cols] = emails.where(valid, pd.NA)
+        valid_counts = df[email_cols].notna().sum()
+        for col in email_cols:
+            logging.info(f"📧 Cleaned {col}: {original_counts[col]} → {valid_counts[col]} valid emails")
 
     # Clean phone fields
-    for col in df.columns:
-        if "PHONE" in col.upper():
-            df[col] = df[col].astype(str).apply(lambda x: re.sub(r"\D", "", x.strip()) if pd.notna(x) else pd.NA)
+    if phone_cols:
+        df[phone_cols] = df[phone_cols].astype(TEXT_DTYPE).apply(
+            lambda s: s.str.replace(NONDIGIT_RE, "", regex=True)
+        )
 
     # Clean name/title fields
-    name_cols = [col for col in df.columns if col.upper() in ["FIRSTNAME", "LASTNAME", "FULLNAME", "TITLE"]]
     for col in name_cols:
-        df[col] = df[col].astype(str).str.title().str.strip()
+        text = df[col] if df[col].dtype.name in ("object", "string") else df[col].astype(TEXT_DTYPE)
+        df[col] = text.str.strip().str.title()
         logging.info(f"👤 Cleaned {col}")
 
     # Clean address/postcode
-    address_cols = [col for col in df.columns if "ADDRESS" in col.upper() or "POST_CODE" in col.upper()]
     for col in address_cols:
-        df[col] = df[col].astype(str).str.strip()
+        text = df[col] if df[col].dtype.name in ("object", "string") else df[col].astype(TEXT_DTYPE)
+        df[col] = text.str.strip()
         logging.info(f"📍 Cleaned {col}")
 
     # Handle boolean fields
     boolean_fields = ["ISACTIVE", "OPTOUT_EMARKETING"] + [f"SUB{i}" for i in range(1, 27)]
-    for col in boolean_fields:
-        if col in df.columns:
-            original_count = df[col].notna().sum()
-            original_values = df[col].value_counts().head(5).to_dict()
-            
-            # Convert to string and standardize to Y/N format
-            df[col] = df[col].astype(str).str.strip().str.upper()
-            
-            # Keep only Y or N values, set everything else to null
-            df[col] = df[col].apply(lambda x: x if x in ["Y", "N"] else pd.NA)
-            
-            final_count = df[col].notna().sum()
-            y_count = (df[col] == "Y").sum()
-            n_count = (df[col] == "N").sum()
-            
-            logging.info(f"✅ Standardised boolean field {col}: {original_count} → {final_count} valid values")
-            logging.info(f"   Original values: {original_values}")
+    bool_cols = [col for col in boolean_fields if col in df.columns]
+    if bool_cols:
+        original_counts = df[bool_cols].notna().sum()
+        original_values = {col: df[col].value_counts().head(5).to_dict() for col in bool_cols}
+
+        # Convert to string and standardize to Y/N format
+        flags = df[bool_cols].astype(TEXT_DTYPE).apply(lambda s: s.str.strip().str.upper())
+
+        # Keep only Y or N values, set everything else to null
+        df[bool_cols] = flags.where(flags.isin(["Y", "N"]), pd.NA)
+
+        final_counts = df[bool_cols].notna().sum()
+        y_counts = (df[bool_cols] == "Y").sum()
+        n_counts = (df[bool_cols] == "N").sum()
+
+        for col in bool_cols:
+            final_count, y_count, n_count = final_counts[col], y_counts[col], n_counts[col]
+            logging.info(f"✅ Standardised boolean field {col}: {original_counts[col]} → {final_count} valid values")
+            logging.info(f"   Original values: {original_values[col]}")
             logging.info(f"   Final: {y_count} Y, {n_count} N, {final_count - y_count - n_count} null")
   
     # Parse dates
     if "LAST_UPDATED" in df.columns:
-        df["LAST_UPDATED"] = pd.to_datetime(df["LAST_UPDATED"], errors="coerce")
+        df["LAST_UPDATED"] = parse_last_updated(df["LAST_UPDATED"])
         valid_dates = df["LAST_UPDATED"].notna().sum()
         logging.info(f"📅 Parsed {valid_dates} valid dates in LAST_UPDATED")
 
@@ -160,74 +210,67 @@ def deduplicate_contacts(df: pd.DataFrame) -> pd.DataFrame:
     original_count = len(df)
     logging.info(f"🧹 Deduplicating {original_count} contacts...")
 
-    df = df.copy()
-    df["DEDUP_KEY"] = ""
+    empty = pd.Series("", index=df.index)
 
-    # Create deduplication keys
+    # Create deduplication keys: email first, falling back to name+mobile
+    email_key = empty
     if "EMAIL" in df.columns:
-        df["DEDUP_KEY"] = df["EMAIL"].fillna("").str.lower()
-        email_keys = (df["DEDUP_KEY"] != "").sum()
+        email_key = df["EMAIL"].fillna("").str.lower()
+        email_keys = (email_key != "").sum()
         logging.info(f"📧 Created {email_keys} deduplication keys based on email")
 
+    name_key = empty
     if "FULLNAME" in df.columns or "MOBILE" in df.columns:
-        mask = df["DEDUP_KEY"] == ""
-        df.loc[mask, "DEDUP_KEY"] = (
-            df.loc[mask, "FULLNAME"].fillna("").str.lower() + "-" +
-            df.loc[mask, "MOBILE"].fillna("")
+        name_key = (
+            df.get("FULLNAME", empty).fillna("").str.lower()
+            .str.cat(df.get("MOBILE", empty).fillna(""), sep="-")
         )
-        name_mobile_keys = (df["DEDUP_KEY"] != "").sum() - email_keys
+        name_mobile_keys = ((email_key == "") & (name_key != "")).sum()
         logging.info(f"👤 Created {name_mobile_keys} deduplication keys based on name+mobile")
 
+    # Blank out placeholder strings; mask() returns a new frame, so the writes below never touch
+    # the caller's data (replace() would also downcast all-null object columns, a pandas FutureWarning)
+    values = df.mask(df.isin(["", "nan", "None", "NaN"]), pd.NA)
+
+    # Group on integer category codes rather than hashing key strings
+    values["DEDUP_KEY"] = email_key.where(email_key != "", name_key).astype("category")
+
     # Sort by last updated to keep most recent
-    if "LAST_UPDATED" in df.columns:
-        df["LAST_UPDATED"] = pd.to_datetime(df["LAST_UPDATED"], errors="coerce")
-        df = df.sort_values(by="LAST_UPDATED", ascending=False)
+    if "LAST_UPDATED" in values.columns:
+        # clean_fields has usually parsed the dates already
+        if not pd.api.types.is_datetime64_any_dtype(values["LAST_UPDATED"]):
+            values["LAST_UPDATED"] = parse_last_updated(values["LAST_UPDATED"])
+        values = values.sort_values(by="LAST_UPDATED", ascending=False)
 
     # Merge duplicate records
-    merged_rows = []
-    total_groups = df.groupby("DEDUP_KEY").ngroups
-    
-    for i, (key, group) in enumerate(df.groupby("DEDUP_KEY"), 1):
-        if i % 1000 == 0:
-            logging.info(f"🔄 Processing group {i}/{total_groups}")
-            
-        # Create a comprehensive merged record by combining all available data
-        merged = {}
-        
-        # For each column, find the best value from all duplicates
-        for col in df.columns:
-            if col == "DEDUP_KEY":
-                continue
-                
-            # Collect all non-null values from all duplicates for this column
-            available_values = []
-            for _, row in group.iterrows():
-                val = row[col]
-                if pd.notna(val) and val not in ["", "nan", "None", "NaN"]:
-                    available_values.append(val)
-            
-            # Choose the best value based on priority:
-            # 1. First non-null value (from most recent record if sorted by LAST_UPDATED)
-            # 2. If multiple values exist, prefer the longest/most complete one
-            if available_values:
-                if len(available_values) == 1:
-                    merged[col] = available_values[0]
-                else:
-                    # If multiple values, choose the most complete one
-                    best_value = max(available_values, key=lambda x: len(str(x)) if pd.notna(x) else 0)
-                    merged[col] = best_value
-                    logging.debug(f"📝 Merged {col}: found {len(available_values)} values, chose '{best_value}'")
-            else:
-                merged[col] = pd.NA
-        
-        merged_rows.append(merged)
+    dedup_keys = values.pop("DEDUP_KEY")
+    value_cols = values.columns
+
+    # Records with a unique key have nothing to merge
+    is_dup = dedup_keys.duplicated(keep=False)
+    unique_df = values.loc[~is_dup]
+    dup_values = values.loc[is_dup].reset_index(drop=True)
+    dup_keys = dedup_keys.loc[is_dup].reset_index(drop=True)
+    logging.info(f"🔄 Merging {dup_keys.nunique()} duplicate groups ({len(dup_values)} records)")
+
+    # Choose the best value for each column based on priority:
+    # 1. First non-null value (from most recent record if sorted by LAST_UPDATED)
+    # 2. If multiple values exist, prefer the longest/most complete one
+    # String columns are measured natively; only other dtypes need a str cast
+    lengths = pd.DataFrame({
+        col: s.str.len() if s.dtype.name == "string" else s.astype(str).str.len()
+        for col, s in dup_values.items()
+    }).where(dup_values.notna(), -1).astype("int64")
+    best_rows = lengths.groupby(dup_keys, observed=True).idxmax()
+
+    # The index is positional, so each column is a single array take
+    merged_df = pd.DataFrame(
+        {col: dup_values[col].array.take(best_rows[col].to_numpy()) for col in value_cols},
+        copy=False,
+    )
 
     # Create the deduplicated dataframe
-    deduplicated_df = pd.DataFrame(merged_rows)
-    
-    # Remove the DEDUP_KEY column if it exists
-    if "DEDUP_KEY" in deduplicated_df.columns:
-        deduplicated_df = deduplicated_df.drop(columns=["DEDUP_KEY"])
+    deduplicated_df = pd.concat([unique_df, merged_df], ignore_index=True)
     
     final_count = len(deduplicated_df)
     duplicates_removed = original_count - final_count
@@ -245,33 +288,81 @@ def find_latest_tsv_file(directory="data_sources"):
     return latest_file
 
 
+def text_csv_options(input_path: str, **read_options) -> dict:
+    """pyarrow CSV options that read every column of the TSV as text"""
+    columns = list(pd.read_csv(input_path, sep='\t', nrows=0).columns)
+    return dict(
+        read_options=pa_csv.ReadOptions(column_names=columns, skip_rows=1, **read_options),
+        parse_options=pa_csv.ParseOptions(delimiter='\t', newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in columns},
+            null_values=NA_VALUES,
+            strings_can_be_null=True,
+        ),
+    )
+
+
+def iter_text_chunks(input_path: str):
+    """Stream the TSV as DataFrames with every column read as text"""
+    if pa_csv is None:
+        yield from pd.read_csv(input_path, sep='\t', dtype=str, chunksize=CHUNK_ROWS)
+        return
+    for batch in pa_csv.open_csv(input_path, **text_csv_options(input_path, block_size=CHUNK_BYTES)):
+        yield batch.to_pandas()
+
+
+def load_cleaned_contacts(input_path: str) -> pd.DataFrame:
+    """Load and clean the input TSV, streaming it in chunks when it is too large to read at once.
+
+    Both paths read every column as text, so the output does not depend on the input's size.
+    """
+    if os.path.getsize(input_path) <= LARGE_INPUT_BYTES:
+        if pa_csv is None:
+            df = pd.read_csv(input_path, sep='\t', dtype=str)
+        else:
+            df = pa_csv.read_csv(input_path, **text_csv_options(input_path)).to_pandas()
+        logging.info(f"📊 Loaded {len(df)} records with {len(df.columns)} columns")
+        return clean_fields(df)
+
+    # Cleaning is row by row, so cleaned chunks concatenate to exactly what a full read would give;
+    # deduplication runs once over the whole result in main()
+    logging.info(f"📦 Streaming large input in chunks")
+    chunks = [clean_fields(chunk) for chunk in iter_text_chunks(input_path)]
+    df = pd.concat(chunks, ignore_index=True)
+    logging.info(f"📊 Loaded {len(df)} records with {len(df.columns)} columns from {len(chunks)} chunks")
+    return df
+
+
 # === Main pipeline ===
-try:
-    # Use the MergedDatabase.tsv file directly from output directory
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    input_path = os.path.join(base_dir, 'output', 'MergedDatabase.tsv')
-    
-    if not os.path.exists(input_path):
-        logging.error(f"❌ MergedDatabase.tsv not found at: {input_path}")
-        logging.error("Please run fill_missing_contacts.py first to generate MergedDatabase.tsv")
-        raise FileNotFoundError(f"MergedDatabase.tsv not found at {input_path}")
-    
-    logging.info(f"📥 Loading file: {input_path}")
-    df = pd.read_csv(input_path, sep='\t')
-    logging.info(f"📊 Loaded {len(df)} records with {len(df.columns)} columns")
-except Exception as e:
-    logging.error(f"❌ Failed to load input file: {e}")
-    raise
-
-cleaned_df = clean_fields(df)
-deduped_df = deduplicate_contacts(cleaned_df)
-
-# Export as TSV
-output_path = "output/cleaned_contacts.tsv"
-os.makedirs("output", exist_ok=True)
-try:
-    deduped_df.to_csv(output_path, index=False, sep='\t')
-    logging.info(f"✅ Cleaned + deduplicated data saved to: {output_path}")
-except Exception as e:
-    logging.error(f"❌ Failed to save output file: {e}")
-    raise
+def main():
+    try:
+        # Use the MergedDatabase.tsv file directly from output directory
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        input_path = os.path.join(base_dir, 'output', 'MergedDatabase.tsv')
+
+        if not os.path.exists(input_path):
+            logging.error(f"❌ MergedDatabase.tsv not found at: {input_path}")
+            logging.error("Please run fill_missing_contacts.py first to generate MergedDatabase.tsv")
+            raise FileNotFoundError(f"MergedDatabase.tsv not found at {input_path}")
+
+        logging.info(f"📥 Loading file: {input_path}")
+        cleaned_df = load_cleaned_contacts(input_path)
+    except Exception as e:
+        logging.error(f"❌ Failed to load input file: {e}")
+        raise
+
+    deduped_df = deduplicate_contacts(cleaned_df)
+
+    # Export as TSV
+    output_path = os.path.join(base_dir, "output", "cleaned_contacts.tsv")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    try:
+        deduped_df.to_csv(output_path, index=False, sep='\t')
+        logging.info(f"✅ Cleaned + deduplicated data saved to: {output_path}")
+    except Exception as e:
+        logging.error(f"❌ Failed to save output file: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    main()
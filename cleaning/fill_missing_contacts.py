@@ -1,153 +1,362 @@
 import os
-import pandas as pd
 import json
+import pandas as pd
 import re
-from collections import defaultdict
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+    from pyarrow import feather as pa_feather
+except ImportError:
+    pa = pa_csv = pa_feather = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from rapidfuzz import fuzz, process
+    process.cpdist  # added in rapidfuzz 3.6
+except (ImportError, AttributeError):
+    fuzz = process = None
+
+# pandas' default na_values, so both readers blank out the same cells
+NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+NONDIGIT_RE = re.compile(r'\D')
+# Deletes every Latin-1 non-digit in one C-level pass; other characters are left for NONDIGIT_RE
+NONDIGIT_TABLE = str.maketrans('', '', ''.join(chr(c) for c in range(256) if not chr(c).isdecimal()))
+
+def read_tsv(path):
+    """Read a TSV with every column as text and missing cells as ''"""
+    if pa_csv is None:
+        return pd.read_csv(path, sep='\t', dtype=str).fillna('')
+    # pandas' engine="pyarrow" infers types before casting (IDs and phones lose leading zeros),
+    # so read with pyarrow directly and declare every column as a string up front
+    columns = list(pd.read_csv(path, sep='\t', nrows=0).columns)
+    table = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(column_names=columns, skip_rows=1),
+        parse_options=pa_csv.ParseOptions(delimiter='\t', newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in columns},
+            null_values=NA_VALUES,
+            strings_can_be_null=True
+        )
+    )
+    return table.to_pandas().fillna('')
 
 def normalize_value(val):
-    """Normalize a string value by stripping whitespace and converting to lowercase"""
-    if pd.isna(val) or val == '':
-        return ''
-    return re.sub(r'\s+', ' ', str(val).strip().lower())
+    """Normalize a string value by stripping whitespace and converting to lowercase
+
+    val must be a str: inputs are read as text with missing cells as '', so no NaN check is needed.
+    """
+    # split() drops leading/trailing whitespace and join collapses the runs between words
+    return ' '.join(val.lower().split())
 
 def normalize_phone(val):
-    """Extract digits from phone number and normalize format"""
-    if pd.isna(val) or val == '':
-        return ''
-    digits = re.sub(r'\D', '', str(val))
-    if len(digits) >= 10:
-        return digits[-10:]  # Keep last 10 digits
-    return digits if digits else ''
-
-def get_full_name(row, first_col=None, last_col=None, name_col=None):
-    """Get normalized full name from row using available name columns"""
-    if first_col and last_col:
-        first = normalize_value(row.get(first_col, ''))
-        last = normalize_value(row.get(last_col, ''))
-        if first or last:
-            return f"{first} {last}".strip()
-    if name_col:
-        return normalize_value(row.get(name_col, ''))
-    return ''
-
-def has_matching_fields(row1, row2, required_matches=2):
-    """Check if two rows match on at least required_matches fields"""
-    matches = 0
-    fields = [('_name', '_name'), ('_phone', '_phone'), ('_email', '_email')]
-    for field1, field2 in fields:
-        val1 = row1.get(field1, '')
-        val2 = row2.get(field2, '')
-        if val1 and val2 and val1 == val2:
-            matches += 1
-            if matches >= required_matches:
-                return True
-    return False
+    """Extract digits from phone number (a str, like normalize_value) and normalize format"""
+    digits = val.translate(NONDIGIT_TABLE)
+    if not digits.isascii():
+        digits = NONDIGIT_RE.sub('', digits)  # non-Latin-1 text, e.g. full-width digits
+    return digits[-10:]  # Keep last 10 digits
 
-def fill_from_source(merged_df, source_df, source_fname, merged_fields, source_fields, change_log):
-    """Fill missing fields in merged_df from matching rows in source_df"""
-    updates = 0
-    
+def normalize_series(s):
+    """normalize_value for a whole text column"""
+    return s.map(normalize_value)
+
+def normalize_phone_series(s):
+    """normalize_phone for a whole text column"""
+    # str.translate beats s.str.replace(NONDIGIT_RE, ...), which runs re.sub per cell anyway
+    return s.map(normalize_phone)
+
+def get_full_name_series(df, first_col=None, last_col=None, name_col=None):
+    """Normalized "first last" where either is set, else the normalized full name column"""
+    names = normalize_series(df[name_col]) if name_col in df.columns else pd.Series('', index=df.index)
+    if first_col in df.columns and last_col in df.columns:
+        first_last = (normalize_series(df[first_col]) + ' ' + normalize_series(df[last_col])).str.strip()
+        names = first_last.where(first_last != '', names)
+    return names
+
+KEY_COLUMNS = ['_name', '_email', '_phone']
+MATCH_COLUMNS = ['name_match', 'email_match', 'phone_match']
+LOG_FIELDS = ['row', 'field', 'old_value', 'new_value', 'source_file', 'matched_on']
+# Minimum fuzz.ratio for two normalized names to count as the same person in the fuzzy pass
+FUZZY_NAME_CUTOFF = 90
+# Part of every source cache file name: bump it whenever the cached columns or the
+# normalization behind the _name/_email/_phone keys change, so stale caches are not reused
+SOURCE_CACHE_VERSION = 2
+
+def write_log_rows(log_file, rows):
+    """Write change-log rows (tuples in LOG_FIELDS order) to log_file, one compact JSON object per line
+
+    Both fill scripts log through here so their logs have one format; orjson, when installed,
+    writes exactly what the json fallback does, only faster.
+    """
+    if orjson is not None:
+        lines = (orjson.dumps(dict(zip(LOG_FIELDS, row))).decode() for row in rows)
+    else:
+        lines = (json.dumps(dict(zip(LOG_FIELDS, row)), separators=(',', ':'), ensure_ascii=False) for row in rows)
+    for line in lines:
+        log_file.write(line + '\n')
+
+def warn_if_no_fuzzy_matching():
+    """Say so when rapidfuzz is unavailable, since the fuzzy name pass then fills fewer rows"""
+    if process is None:
+        print("Warning: rapidfuzz>=3.6 is not installed, skipping the fuzzy name matching pass")
+
+def key_codes(df):
+    """Integer codes of categorical key columns, with -1 marking an empty or unknown key"""
+    codes = {}
+    for col in df.columns:
+        col_codes = df[col].cat.codes.to_numpy()
+        empty_code = df[col].cat.categories.get_indexer([''])[0]
+        codes[col] = np.where(col_codes == empty_code, -1, col_codes)
+    return pd.DataFrame(codes, index=df.index)
+
+def has_gaps(df):
+    """Rows with at least one empty cell (inputs are read with missing values as '')"""
+    return (df == '').any(axis=1)
+
+def empty_masks(df, fields):
+    """Per-field boolean arrays marking empty cells"""
+    return {field: (df[field] == '').to_numpy() for field in fields}
+
+def usable_values(values):
+    """Source cells worth copying: non-empty and not a stringified NaN"""
+    return (values != '') & (values != 'nan')
+
+def find_fill_candidates(merged_df, source_df, merged_fields, source_fields):
+    """Find (merged row, source row) pairs that match on at least 2 keys where the source can fill a gap.
+
+    With rapidfuzz installed, source rows without such a match may also pair with rows that
+    share their email or phone and have a name scoring FUZZY_NAME_CUTOFF or more.
+    Returns one row per pair, ordered by merged row and then source row, holding the
+    merged row label, a match flag per key, a fuzzy_name flag and the source values under merged_fields.
+    """
     # Pre-filter to only rows with missing data
-    missing_mask = merged_df[merged_fields].isnull().any(axis=1) | (merged_df[merged_fields] == '').any(axis=1)
+    missing_mask = has_gaps(merged_df[merged_fields])
     missing_indices = merged_df.index[missing_mask]
     
-    if len(missing_indices) == 0:
+    keys = KEY_COLUMNS
+    target_keys = key_codes(merged_df.loc[missing_indices, keys]).assign(target_pos=np.arange(len(missing_indices)))
+    # Source keys take the merged categories so codes line up; keys the merged side lacks become -1
+    source_keys = key_codes(
+        source_df[keys].astype({key: merged_df[key].dtype for key in keys})
+    ).assign(source_pos=np.arange(len(source_df)))
+    
+    # Candidate (target, source) pairs: hash-join on each non-empty key code
+    pairs = pd.concat(
+        [target_keys.loc[target_keys[key] != -1, [key, 'target_pos']]
+         .merge(source_keys.loc[source_keys[key] != -1, [key, 'source_pos']], on=key)
+         for key in keys],
+        ignore_index=True
+    )[['target_pos', 'source_pos']].drop_duplicates(ignore_index=True)
+    t_pos = pairs['target_pos'].to_numpy()
+    s_pos = pairs['source_pos'].to_numpy()
+    
+    # Which normalized keys agree for each pair (compared as int codes) - need at least 2 matching fields
+    key_matches = np.column_stack([
+        (target_keys[key].to_numpy()[t_pos] != -1)
+        & (target_keys[key].to_numpy()[t_pos] == source_keys[key].to_numpy()[s_pos])
+        for key in keys
+    ])
+    exact = key_matches.sum(axis=1) >= 2
+    
+    # Fuzzy second pass: a source row with no exact match can still match a row sharing its
+    # email or phone when the names are near-identical, e.g. "jon smith" and "john smith"
+    fuzzy_name = np.zeros(len(pairs), dtype=bool)
+    if fuzz is not None:
+        target_names = merged_df.loc[missing_indices, '_name'].to_numpy(dtype=object)[t_pos]
+        source_names = source_df['_name'].to_numpy(dtype=object)[s_pos]
+        unmatched = (
+            ~np.isin(s_pos, s_pos[exact]) & ~key_matches[:, 0]
+            & (target_names != '') & (source_names != '')
+        )
+        if unmatched.any():
+            # One thread: this already runs in one of cpu_count() pool processes
+            scores = process.cpdist(source_names[unmatched], target_names[unmatched], scorer=fuzz.ratio, workers=1)
+            fuzzy_name[unmatched] = scores >= FUZZY_NAME_CUTOFF
+    
+    # Fields a pair can fill: missing in the target, usable in the source
+    target_values = merged_df.loc[missing_indices, merged_fields].to_numpy()[t_pos]
+    source_values = source_df[source_fields].to_numpy()[s_pos]
+    fills = (target_values == '') & usable_values(source_values)
+    qualified = (exact | fuzzy_name) & fills.any(axis=1)
+    
+    order = np.flatnonzero(qualified)
+    order = order[np.lexsort((s_pos[order], t_pos[order]))]
+    candidates = pd.DataFrame(source_values[order], columns=merged_fields)
+    candidates.insert(0, 'row', missing_indices[t_pos[order]])
+    for i, col in enumerate(MATCH_COLUMNS):
+        candidates.insert(i + 1, col, key_matches[order, i])
+    candidates.insert(len(MATCH_COLUMNS) + 1, 'fuzzy_name', fuzzy_name[order])
+    return candidates
+
+def apply_fill_candidates(merged_df, candidates, source_fname, merged_fields, change_log, empty=None):
+    """Fill each merged row from its first candidate that still has something to add.
+
+    empty maps each field to its empty-cell mask (see empty_masks); pass the same dict
+    across sources to skip rescanning merged_df; it is updated as fills land.
+    change_log maps each of LOG_FIELDS to a list that gets one item per filled cell.
+    """
+    if empty is None:
+        empty = empty_masks(merged_df, merged_fields)
+    missing_mask = np.logical_or.reduce([empty[field] for field in merged_fields])
+    if not missing_mask.any():
         return 0
         
-    print(f"Processing {len(missing_indices)} rows with missing data from {source_fname}")
-    
-    # Create lookup dictionaries for faster matching
-    source_lookups = {
-        'name': defaultdict(list),
-        'email': defaultdict(list), 
-        'phone': defaultdict(list)
-    }
-    
-    # Build lookups once
-    for idx, row in source_df.iterrows():
-        name = row.get('_name', '').strip()
-        email = row.get('_email', '').strip()
-        phone = row.get('_phone', '').strip()
-        
-        if name:
-            source_lookups['name'][name].append(idx)
-        if email:
-            source_lookups['email'][email].append(idx)
-        if phone:
-            source_lookups['phone'][phone].append(idx)
-    
-    # Process missing rows in batches for better performance
-    for idx in missing_indices:
-        target = merged_df.loc[idx]
-        target_name = target.get('_name', '').strip()
-        target_email = target.get('_email', '').strip()
-        target_phone = target.get('_phone', '').strip()
-        
-        # Find candidate matches efficiently
-        candidates = set()
-        if target_name in source_lookups['name']:
-            candidates.update(source_lookups['name'][target_name])
-        if target_email in source_lookups['email']:
-            candidates.update(source_lookups['email'][target_email])
-        if target_phone in source_lookups['phone']:
-            candidates.update(source_lookups['phone'][target_phone])
-        
-        # Check each candidate for a valid match
-        for candidate_idx in candidates:
-            source_row = source_df.loc[candidate_idx]
-            
-            # Quick match check - need at least 2 matching fields
-            match_count = 0
-            matched_fields = []
-            
-            if target_name and source_row.get('_name', '').strip() == target_name:
-                match_count += 1
-                matched_fields.append(f"name: '{target_name}'")
-            if target_email and source_row.get('_email', '').strip() == target_email:
-                match_count += 1
-                matched_fields.append(f"email: '{target_email}'")
-            if target_phone and source_row.get('_phone', '').strip() == target_phone:
-                match_count += 1
-                matched_fields.append(f"phone: '{target_phone}'")
-                
-            if match_count >= 2:
-                # Fill missing fields
-                changed = False
-                match_info = " & ".join(matched_fields)
-                
-                for m_field, s_field in zip(merged_fields, source_fields):
-                    if pd.isna(target[m_field]) or target[m_field] == '':
-                        s_val = source_row.get(s_field, '')
-                        if s_val and str(s_val) != 'nan':
-                            merged_df.at[idx, m_field] = s_val
-                            change_log.append({
-                                'row': int(idx) + 1,
-                                'field': m_field,
-                                'old_value': target[m_field],
-                                'new_value': s_val,
-                                'source_file': source_fname,
-                                'matched_on': match_info
-                            })
-                            changed = True
-                            
-                if changed:
-                    updates += 1
-                    break  # Stop after first successful match
+    print(f"Processing {missing_mask.sum()} rows with missing data from {source_fname}")
+    
+    # Re-check against the current masks: earlier sources may have filled some gaps already
+    rows = candidates['row'].to_numpy()
+    positions = merged_df.index.get_indexer(rows)
+    source_values = candidates[merged_fields].to_numpy()
+    fills = np.column_stack([empty[field][positions] for field in merged_fields]) & usable_values(source_values)
+    
+    # Each row takes the first useful candidate in source file order. This is a deliberate
+    # tie-break: the original loop walked a set of candidate indices, so which source row
+    # won among several matches was arbitrary, and it differs from this rule
+    best_pairs = candidates[fills.any(axis=1)].drop_duplicates('row').index.to_numpy()
+    best_rows = rows[best_pairs]
+    
+    # One block assignment per field instead of an .at write per cell
+    for i, m_field in enumerate(merged_fields):
+        filled = fills[best_pairs, i]
+        if filled.any():
+            merged_df.loc[best_rows[filled], m_field] = source_values[best_pairs[filled], i]
+            empty[m_field][positions[best_pairs[filled]]] = False
+    
+    labels = ['name', 'email', 'phone']
+    key_values = merged_df.loc[best_rows, KEY_COLUMNS].to_numpy()
+    key_matches = candidates.loc[best_pairs, MATCH_COLUMNS].to_numpy()
+    fuzzy_names = candidates.loc[best_pairs, 'fuzzy_name'].to_numpy()
+    match_info = []
+    for values, matches, fuzzy_name in zip(key_values, key_matches, fuzzy_names):
+        matched_fields = [
+            f"{label}: '{value}'"
+            for label, value, matched in zip(labels, values, matches)
+            if matched
+        ]
+        if fuzzy_name:
+            matched_fields.insert(0, f"name ~ '{values[0]}'")
+        match_info.append(" & ".join(matched_fields))
+    
+    # Log columns are extended in bulk: one entry per filled cell, pair by pair in field order
+    pair_pos, field_pos = np.nonzero(fills[best_pairs])
+    change_log['row'].extend((best_rows[pair_pos] + 1).tolist())
+    change_log['field'].extend(merged_fields[i] for i in field_pos)
+    change_log['old_value'].extend([''] * len(pair_pos))
+    change_log['new_value'].extend(source_values[best_pairs[pair_pos], field_pos].tolist())
+    change_log['source_file'].extend([source_fname] * len(pair_pos))
+    change_log['matched_on'].extend(match_info[i] for i in pair_pos)
                 
-    return updates
+    return len(best_pairs)
+
+def fill_from_source(merged_df, source_df, source_fname, merged_fields, source_fields, change_log):
+    """Fill missing fields in merged_df from matching rows in source_df"""
+    candidates = find_fill_candidates(merged_df, source_df, merged_fields, source_fields)
+    return apply_fill_candidates(merged_df, candidates, source_fname, merged_fields, change_log)
+
+def source_cache_path(src_path, cache_dir):
+    """Feather cache file for a source, keyed by its size, modification time and SOURCE_CACHE_VERSION"""
+    stat = os.stat(src_path)
+    return os.path.join(
+        cache_dir,
+        f"{os.path.basename(src_path)}.{stat.st_size}.{stat.st_mtime_ns}.v{SOURCE_CACHE_VERSION}.feather"
+    )
+
+def write_source_cache(src_df, src_path, cache_path):
+    """Save a normalized source to cache_path, replacing older caches of the same file"""
+    cache_dir = os.path.dirname(cache_path)
+    prefix = os.path.basename(src_path) + '.'
+    os.makedirs(cache_dir, exist_ok=True)
+    for old in os.listdir(cache_dir):
+        if old.startswith(prefix) and old.endswith('.feather'):
+            os.remove(os.path.join(cache_dir, old))
+    # Uncompressed so later runs can memory-map it; written aside then renamed so readers never see a partial file
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    pa_feather.write_feather(src_df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path)
+
+def match_source_file(src_path, merged_df, merged_columns, cache_dir=None):
+    """Read one source file and find its fill candidates; runs in a worker process.
+
+    The normalized source is cached as Feather in cache_dir (when pyarrow is available)
+    so unchanged files skip parsing and normalization on later runs.
+    Returns (merged_fields, candidates), or None when the file lacks the required columns.
+    """
+    first_col, last_col, email_col, phone_col = merged_columns
+    cache_path = source_cache_path(src_path, cache_dir) if cache_dir and pa_feather is not None else None
+    cached = cache_path is not None and os.path.exists(cache_path)
+    if cached:
+        src_df = pa_feather.read_feather(cache_path, memory_map=True)
+        src_columns = src_df.columns.drop(KEY_COLUMNS)
+    else:
+        src_df = read_tsv(src_path)
+        src_columns = src_df.columns
+    
+    # Find columns in source file
+    # Check all common variations of column names
+    src_first = next((col for col in src_columns if col in ['First Name', 'FirstName', 'firstname']), None)
+    src_last = next((col for col in src_columns if col in ['Last Name', 'LastName', 'lastname']), None)
+    src_name = next((col for col in src_columns if col in ['Name', 'Full Name', 'FullName', 'fullname']), None)
+    src_email = next((col for col in src_columns if col in ['Email Address', 'Email', 'email']), None)
+    src_phones = [col for col in src_columns if any(p in col for p in ['Phone Number', 'Mobile Number', 'Phone', 'Mobile', 'mobile', 'phone'])]
+    
+    # Skip if file doesn't have required columns
+    if not any([src_first and src_last, src_name]) or (not src_email and not src_phones):
+        return None
+        
+    # Normalize source fields
+    if not cached:
+        src_df['_name'] = get_full_name_series(src_df, src_first, src_last, src_name)
+        src_df['_phone'] = normalize_phone_series(src_df[src_phones[0]]) if src_phones else ''
+        src_df['_email'] = normalize_series(src_df[src_email]) if src_email else ''
+        if cache_path:
+            write_source_cache(src_df, src_path, cache_path)
+    
+    # Define field mappings
+    merged_fields = []
+    source_fields = []
+    
+    if first_col and src_first:
+        merged_fields.append(first_col)
+        source_fields.append(src_first)
+    if last_col and src_last:
+        merged_fields.append(last_col)
+        source_fields.append(src_last)
+    if email_col and src_email:
+        merged_fields.append(email_col)
+        source_fields.append(src_email)
+    # Only add the first phone field instead of all phone fields
+    if phone_col and src_phones:
+        merged_fields.append(phone_col)  # Only the first merged phone column (MOBILE)
+        source_fields.append(src_phones[0])
+    
+    return merged_fields, find_fill_candidates(merged_df, src_df, merged_fields, source_fields)
 
 def main():
     # Paths
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     data_dir = os.path.join(base_dir, 'data_files')
     output_dir = os.path.join(base_dir, 'output')
+    cache_dir = os.path.join(base_dir, '.cache')
     merged_path = os.path.join(output_dir, 'MergedDatabase.tsv')
-    log_path = os.path.join(output_dir, 'fill_missing_log.json')
+    log_path = os.path.join(output_dir, 'fill_missing_log.jsonl')
+    
+    warn_if_no_fuzzy_matching()
     
     # Load merged database
     print(f"\nLoading {merged_path}...")
-    merged_df = pd.read_csv(merged_path, sep='\t', dtype=str).fillna('')
+    merged_df = read_tsv(merged_path)
     
     # Find columns in merged file - handle exact column names (uppercase)
     first_col = 'FIRSTNAME'  # Known column name in MergedDatabase.tsv
@@ -163,69 +372,51 @@ def main():
     print(f"  Email: {email_col} ({merged_df[email_col].notna().sum()} non-empty)")
     
     print("\nNormalizing fields in merged database...")
-    merged_df['_name'] = merged_df.apply(lambda r: get_full_name(r, first_col, last_col, name_col), axis=1)
-    merged_df['_phone'] = merged_df[phone_cols[0]].apply(normalize_phone) if phone_cols else ''
-    merged_df['_email'] = merged_df[email_col].apply(normalize_value) if email_col else ''
-    
-    # Process all TSV files in data_files directory
-    change_log = []
-    total_files = len([f for f in os.listdir(data_dir) if f.endswith('.tsv')])
-    processed = 0
-    
-    for fname in os.listdir(data_dir):
-        if not fname.endswith('.tsv'):
-            continue
-            
-        processed += 1
-        print(f"\nProcessing file {processed}/{total_files}: {fname}")
-        src_path = os.path.join(data_dir, fname)
-        
-        # Read and process source file
-        src_df = pd.read_csv(src_path, sep='\t', dtype=str).fillna('')
-        
-        # Find columns in source file
-        # Check all common variations of column names
-        src_first = next((col for col in src_df.columns if col in ['First Name', 'FirstName', 'firstname']), None)
-        src_last = next((col for col in src_df.columns if col in ['Last Name', 'LastName', 'lastname']), None)
-        src_name = next((col for col in src_df.columns if col in ['Name', 'Full Name', 'FullName', 'fullname']), None)
-        src_email = next((col for col in src_df.columns if col in ['Email Address', 'Email', 'email']), None)
-        src_phones = [col for col in src_df.columns if any(p in col for p in ['Phone Number', 'Mobile Number', 'Phone', 'Mobile', 'mobile', 'phone'])]
-        
-        # Skip if file doesn't have required columns
-        if not any([src_first and src_last, src_name]) or (not src_email and not src_phones):
-            print(f"Skipping {fname} - missing required columns")
-            continue
-            
-        # Normalize source fields
-        src_df['_name'] = src_df.apply(lambda r: get_full_name(r, src_first, src_last, src_name), axis=1)
-        src_df['_phone'] = src_df[src_phones[0]].apply(normalize_phone) if src_phones else ''
-        src_df['_email'] = src_df[src_email].apply(normalize_value) if src_email else ''
-        
-        # Define field mappings
-        merged_fields = []
-        source_fields = []
-        
-        if first_col and src_first:
-            merged_fields.append(first_col)
-            source_fields.append(src_first)
-        if last_col and src_last:
-            merged_fields.append(last_col)
-            source_fields.append(src_last)
-        if email_col and src_email:
-            merged_fields.append(email_col)
-            source_fields.append(src_email)
-        # Only add the first phone field instead of all phone fields
-        if phone_cols and src_phones:
-            merged_fields.append(phone_cols[0])  # Only use the first phone column (MOBILE)
-            source_fields.append(src_phones[0])
-        
-        # Fill missing fields from this source
-        updates = fill_from_source(
-            merged_df, src_df, fname,
-            merged_fields, source_fields,
-            change_log
+    merged_df['_name'] = get_full_name_series(merged_df, first_col, last_col, name_col)
+    merged_df['_phone'] = normalize_phone_series(merged_df[phone_cols[0]]) if phone_cols else ''
+    merged_df['_email'] = normalize_series(merged_df[email_col]) if email_col else ''
+    
+    # Categorical join keys: each distinct value is stored once and matching runs on int codes
+    for col in KEY_COLUMNS:
+        merged_df[col] = merged_df[col].astype('category')
+    
+    # Match all source files in parallel against the rows that have gaps, then
+    # apply the results in file order so earlier files keep priority as before
+    total_changes = 0
+    fnames = [f for f in os.listdir(data_dir) if f.endswith('.tsv')]
+    total_files = len(fnames)
+    
+    merged_columns = (first_col, last_col, email_col, phone_cols[0] if phone_cols else None)
+    fill_fields = [col for col in merged_columns if col]
+    # Empty-cell masks are computed once and kept current as fills land
+    empty = empty_masks(merged_df, fill_fields)
+    gaps = np.logical_or.reduce(list(empty.values()))
+    merged_keys = merged_df.loc[gaps, KEY_COLUMNS + fill_fields]
+    
+    # Changes are streamed to the log one JSON object per line as each file is applied
+    print(f"Writing change log to {log_path}")
+    with open(log_path, 'w', encoding='utf-8') as log_f, \
+            ProcessPoolExecutor(max_workers=max(1, min(total_files, os.cpu_count() or 1))) as pool:
+        matches = pool.map(
+            match_source_file,
+            [os.path.join(data_dir, fname) for fname in fnames],
+            repeat(merged_keys),
+            repeat(merged_columns),
+            repeat(cache_dir)
         )
-        print(f"Made {updates} updates from {fname}")
+        for processed, (fname, match) in enumerate(zip(fnames, matches), 1):
+            print(f"\nProcessing file {processed}/{total_files}: {fname}")
+            if match is None:
+                print(f"Skipping {fname} - missing required columns")
+                continue
+                
+            # Fill missing fields from this source
+            merged_fields, candidates = match
+            change_log = {field: [] for field in LOG_FIELDS}
+            updates = apply_fill_candidates(merged_df, candidates, fname, merged_fields, change_log, empty)
+            write_log_rows(log_f, zip(*(change_log[field] for field in LOG_FIELDS)))
+            total_changes += len(change_log['row'])
+            print(f"Made {updates} updates from {fname}")
     
     # Drop temporary columns and save results
     merged_df.drop(columns=['_name', '_phone', '_email'], inplace=True)
@@ -233,13 +424,8 @@ def main():
     # Save updated database
     print(f"\nSaving updated database to {merged_path}")
     merged_df.to_csv(merged_path, sep='\t', index=False)
-    
-    # Save change log
-    print(f"Writing change log to {log_path}")
-    with open(log_path, 'w') as f:
-        json.dump(change_log, f, indent=2)
         
-    print(f"\nDone! Made {len(change_log)} total updates across {total_files} files.")
+    print(f"\nDone! Made {total_changes} total updates across {total_files} files.")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
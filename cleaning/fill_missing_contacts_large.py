@@ -1,37 +1,87 @@
 import os
 import pandas as pd
-import json
-import re
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 import sqlite3
 from pathlib import Path
 
-def normalize_value(val):
-    """Normalize a string value by stripping whitespace and converting to lowercase"""
-    if pd.isna(val) or val == '':
-        return ''
-    return re.sub(r'\s+', ' ', str(val).strip().lower())
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:
+    pa = pa_csv = None
 
-def normalize_phone(val):
-    """Extract digits from phone number and normalize format"""
-    if pd.isna(val) or val == '':
-        return ''
-    digits = re.sub(r'\D', '', str(val))
-    if len(digits) >= 10:
-        return digits[-10:]  # Keep last 10 digits
-    return digits if digits else ''
+# Readers, key normalization and the optional rapidfuzz are shared with fill_missing_contacts
+# so both variants match alike
+try:
+    from .fill_missing_contacts import (
+        NA_VALUES, read_tsv, normalize_series, normalize_phone_series, get_full_name_series,
+        fuzz, process, warn_if_no_fuzzy_matching, write_log_rows
+    )
+except ImportError:
+    # Run as a script: the cleaning directory itself is on sys.path
+    from fill_missing_contacts import (
+        NA_VALUES, read_tsv, normalize_series, normalize_phone_series, get_full_name_series,
+        fuzz, process, warn_if_no_fuzzy_matching, write_log_rows
+    )
+
+def iter_tsv_chunks(path, chunk_size):
+    """Stream a TSV as DataFrames with every column as text and missing cells as ''"""
+    if pa_csv is None:
+        for chunk in pd.read_csv(path, sep='\t', dtype=str, chunksize=chunk_size):
+            yield chunk.fillna('')
+        return
+    # Every column is declared a string up front so IDs and phones keep their leading zeros
+    columns = list(pd.read_csv(path, sep='\t', nrows=0).columns)
+    reader = pa_csv.open_csv(
+        path,
+        read_options=pa_csv.ReadOptions(column_names=columns, skip_rows=1, block_size=64 << 20),
+        parse_options=pa_csv.ParseOptions(delimiter='\t', newlines_in_values=True),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in columns},
+            null_values=NA_VALUES,
+            strings_can_be_null=True
+        )
+    )
+    for batch in reader:
+        yield batch.to_pandas().fillna('')
 
-def get_full_name(row, first_col=None, last_col=None, name_col=None):
-    """Get normalized full name from row using available name columns"""
-    if first_col and last_col:
-        first = normalize_value(row.get(first_col, ''))
-        last = normalize_value(row.get(last_col, ''))
-        if first or last:
-            return f"{first} {last}".strip()
-    if name_col:
-        return normalize_value(row.get(name_col, ''))
-    return ''
+# Filled rows are written back in batches of this many
+UPDATE_BATCH_SIZE = 10000
+
+# Merged columns filled from the sources, and the rows that still have something to fill
+FILL_FIELDS = ['FIRSTNAME', 'LASTNAME', 'X_EMAIL2', 'MOBILE']
+MISSING_DATA = "(FIRSTNAME = '' OR LASTNAME = '' OR X_EMAIL2 = '' OR MOBILE = '')"
+# Minimum fuzz.ratio for two normalized names to count as the same person in the fuzzy pass
+FUZZY_NAME_CUTOFF = 90
+
+def connect_temp_db(temp_db_path):
+    """Open the temporary database; it is rebuilt every run, so skip fsyncs and keep the journal in memory"""
+    conn = sqlite3.connect(temp_db_path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-200000")  # ~200MB page cache
+    return conn
+
+def flush_updates(conn, pending):
+    """Write pending {orig_index: [first, last, email, mobile]} fills with one executemany"""
+    conn.executemany(
+        "UPDATE merged_data SET FIRSTNAME = ?, LASTNAME = ?, X_EMAIL2 = ?, MOBILE = ? WHERE orig_index = ?",
+        [(*values, orig_idx) for orig_idx, values in pending.items()]
+    )
+    pending.clear()
+
+def create_merged_table(conn, columns):
+    """Create merged_data with orig_index as its INTEGER PRIMARY KEY (the rowid), so rows are unique and stored in file order
+
+    Returns the prepared INSERT for rows with the given columns, in that order.
+    """
+    quoted = {col: '"{}"'.format(col.replace('"', '""')) for col in columns}
+    column_defs = [f"{quoted[col]} TEXT" for col in columns if col != 'orig_index']
+    conn.execute(f"CREATE TABLE merged_data ({', '.join(column_defs)}, orig_index INTEGER PRIMARY KEY)")
+    return f"INSERT INTO merged_data ({', '.join(quoted.values())}) VALUES ({', '.join('?' * len(columns))})"
 
 def create_temp_database(merged_path, temp_db_path):
     """Create a temporary SQLite database from the large TSV file"""
@@ -41,47 +91,82 @@ def create_temp_database(merged_path, temp_db_path):
     if os.path.exists(temp_db_path):
         os.remove(temp_db_path)
     
-    conn = sqlite3.connect(temp_db_path)
+    conn = connect_temp_db(temp_db_path)
     
-    # Read and process the large file in chunks
-    chunk_size = 10000  # Process 10k rows at a time
+    # Read and process the large file in chunks (64MB blocks with pyarrow, else 10k rows)
+    chunk_size = 10000
     chunk_num = 0
+    rows_loaded = 0
     
-    for chunk in pd.read_csv(merged_path, sep='\t', dtype=str, chunksize=chunk_size):
+    for chunk in iter_tsv_chunks(merged_path, chunk_size):
         chunk_num += 1
         print(f"Processing chunk {chunk_num} ({len(chunk)} rows)...")
         
-        # Fill NaN values
-        chunk = chunk.fillna('')
-        
         # Add normalized columns
-        chunk['_name'] = chunk.apply(lambda r: get_full_name(r, 'FIRSTNAME', 'LASTNAME', 'FULLNAME'), axis=1)
-        chunk['_phone'] = chunk['MOBILE'].apply(normalize_phone) if 'MOBILE' in chunk.columns else ''
-        chunk['_email'] = chunk['X_EMAIL2'].apply(normalize_value) if 'X_EMAIL2' in chunk.columns else ''
+        chunk['_name'] = get_full_name_series(chunk, 'FIRSTNAME', 'LASTNAME', 'FULLNAME')
+        chunk['_phone'] = normalize_phone_series(chunk['MOBILE']) if 'MOBILE' in chunk.columns else ''
+        chunk['_email'] = normalize_series(chunk['X_EMAIL2']) if 'X_EMAIL2' in chunk.columns else ''
         
         # Add row index
-        chunk['orig_index'] = chunk.index + (chunk_num - 1) * chunk_size
+        chunk['orig_index'] = np.arange(rows_loaded, rows_loaded + len(chunk))
+        rows_loaded += len(chunk)
         
-        # Write to SQLite
-        chunk.to_sql('merged_data', conn, if_exists='append', index=False)
-    
-    # Create indexes for faster lookups
-    print("Creating database indexes...")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_name ON merged_data(_name)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_email ON merged_data(_email)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_phone ON merged_data(_phone)")
-    conn.execute("CREATE INDEX IF NOT EXISTS idx_orig_index ON merged_data(orig_index)")
+        # Write to SQLite with one prepared INSERT per chunk; iter_tsv_chunks has already turned
+        # missing cells into '', so they are stored as '' (never NULL) and MISSING_DATA tests = ''
+        if chunk_num == 1:
+            insert_sql = create_merged_table(conn, chunk.columns)
+        conn.executemany(insert_sql, chunk.itertuples(index=False, name=None))
     
     conn.commit()
     conn.close()
     print("Temporary database created successfully")
 
-def process_source_file_chunked(src_path, temp_db_path, source_fname, change_log):
-    """Process a source file against the database using chunked approach"""
-    print(f"\nProcessing source file: {source_fname}")
-    
+def key_pairs(name, email, phone):
+    """Keys for each pair of non-empty match fields; two records sharing one match on at least 2 fields"""
+    pairs = []
+    if name and email:
+        pairs.append(('name+email', name, email))
+    if name and phone:
+        pairs.append(('name+phone', name, phone))
+    if email and phone:
+        pairs.append(('email+phone', email, phone))
+    return pairs
+
+def load_missing_rows(conn):
+    """Keys and current fill values of the rows that still have missing data, plus the rows indexed by each pair of keys
+
+    Two records match on at least 2 fields exactly when they share a pair, so candidates
+    never include rows that only share a common name (or just one other key).
+    With rapidfuzz installed, rows are also indexed by their email and phone alone for the fuzzy name pass.
+    """
+    target_keys = {}
+    current_values = {}
+    pair_index = defaultdict(list)
+    cursor = conn.execute(f"""
+    SELECT orig_index, _name, _email, _phone, FIRSTNAME, LASTNAME, X_EMAIL2, MOBILE
+    FROM merged_data 
+    WHERE {MISSING_DATA}
+    """)
+    for orig_idx, target_name, target_email, target_phone, *values in cursor:
+        target_keys[orig_idx] = (target_name, target_email, target_phone)
+        current_values[orig_idx] = values
+        for key in key_pairs(target_name, target_email, target_phone):
+            pair_index[key].append(orig_idx)
+        if process is not None:
+            for key in (('email', target_email), ('phone', target_phone)):
+                if key[1]:
+                    pair_index[key].append(orig_idx)
+    return target_keys, current_values, pair_index
+
+def read_source_file(src_path):
+    """Read and normalize one source file (runs in a worker process)
+
+    Returns None if the file lacks the required columns, else a DataFrame with the normalized
+    _name/_email/_phone keys and the FILL_FIELDS values of every source row, in file order;
+    '' stands in for fill columns the file doesn't have.
+    """
     # Read source file
-    src_df = pd.read_csv(src_path, sep='\t', dtype=str).fillna('')
+    src_df = read_tsv(src_path)
     
     # Find columns in source file
     src_first = next((col for col in src_df.columns if col in ['First Name', 'FirstName', 'firstname']), None)
@@ -92,157 +177,137 @@ def process_source_file_chunked(src_path, temp_db_path, source_fname, change_log
     
     # Skip if file doesn't have required columns
     if not any([src_first and src_last, src_name]) or (not src_email and not src_phones):
-        print(f"Skipping {source_fname} - missing required columns")
-        return 0
+        return None
     
-    # Normalize source fields
-    src_df['_name'] = src_df.apply(lambda r: get_full_name(r, src_first, src_last, src_name), axis=1)
-    src_df['_phone'] = src_df[src_phones[0]].apply(normalize_phone) if src_phones else ''
-    src_df['_email'] = src_df[src_email].apply(normalize_value) if src_email else ''
+    # Normalize source fields; only the keys and fill values go back to the parent
+    source = pd.DataFrame({
+        '_name': get_full_name_series(src_df, src_first, src_last, src_name),
+        '_email': normalize_series(src_df[src_email]) if src_email else '',
+        '_phone': normalize_phone_series(src_df[src_phones[0]]) if src_phones else '',
+    })
+    for field, col in zip(FILL_FIELDS, (src_first, src_last, src_email, src_phones[0] if src_phones else None)):
+        source[field] = src_df[col] if col else ''
+    return source
+
+def iter_source_files(pool, src_paths, max_pending):
+    """read_source_file each path in pool, yielding results in order with at most max_pending in flight"""
+    pending = deque()
+    for src_path in src_paths:
+        pending.append(pool.submit(read_source_file, src_path))
+        if len(pending) > max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def match_source_rows(source, target_keys, pair_index):
+    """Match a normalized source (from read_source_file) against the rows with missing data
+
+    Returns a list with one ((first, last, email, mobile), [(orig_index, matched_on), ...])
+    entry per source row that matched something, in file order.
+    """
+    names = source['_name'].tolist()
+    emails = source['_email'].tolist()
+    phones = source['_phone'].tolist()
     
-    conn = sqlite3.connect(temp_db_path)
-    updates = 0
+    # Find records that match on at least 2 fields and have missing data; rows found by several pairs are kept once
+    found_by_row = {}
+    fuzzy_rows = []
+    for pos, (source_name, source_email, source_phone) in enumerate(zip(names, emails, phones)):
+        found = set()
+        for key in key_pairs(source_name, source_email, source_phone):
+            found.update(pair_index.get(key, ()))
+        if found:
+            found_by_row[pos] = found
+        elif process is not None and source_name != '':
+            fuzzy_rows.append(pos)
     
-    # Process each source record
-    for _, source_row in src_df.iterrows():
-        source_name = source_row.get('_name', '').strip()
-        source_email = source_row.get('_email', '').strip()
-        source_phone = source_row.get('_phone', '').strip()
-        
-        if not any([source_name, source_email, source_phone]):
-            continue
-        
-        # Build query to find matching records with missing data
-        conditions = []
-        params = []
-        
-        if source_name:
-            conditions.append("_name = ?")
-            params.append(source_name)
-        if source_email:
-            conditions.append("_email = ?")
-            params.append(source_email)
-        if source_phone:
-            conditions.append("_phone = ?")
-            params.append(source_phone)
-        
-        if len(conditions) < 2:
-            continue  # Need at least 2 matching fields
-        
-        # Find records that match on at least 2 fields and have missing data
-        query = f"""
-        SELECT orig_index, _name, _email, _phone, FIRSTNAME, LASTNAME, X_EMAIL2, MOBILE
-        FROM merged_data 
-        WHERE ({' OR '.join(conditions)})
-        AND (FIRSTNAME = '' OR LASTNAME = '' OR X_EMAIL2 = '' OR MOBILE = '')
-        """
-        
-        cursor = conn.execute(query, params)
-        matches = cursor.fetchall()
-        
-        for match in matches:
-            orig_idx, target_name, target_email, target_phone = match[:4]
-            current_first, current_last, current_email, current_mobile = match[4:]
+    # Fuzzy second pass: a source row with no exact match can still match a row sharing its
+    # email or phone when the names are near-identical, e.g. "jon smith" and "john smith".
+    # Every candidate pair of the file is scored in one cpdist call
+    candidates = []
+    for pos in fuzzy_rows:
+        for key in (('email', emails[pos]), ('phone', phones[pos])):
+            candidates.extend((pos, orig_idx) for orig_idx in pair_index.get(key, ()) if target_keys[orig_idx][0])
+    if candidates:
+        scores = process.cpdist(
+            [names[pos] for pos, _ in candidates],
+            [target_keys[orig_idx][0] for _, orig_idx in candidates],
+            scorer=fuzz.ratio,
+            workers=-1
+        )
+        for (pos, orig_idx), score in zip(candidates, scores):
+            if score >= FUZZY_NAME_CUTOFF:
+                found_by_row.setdefault(pos, set()).add(orig_idx)
+    fuzzy_rows = set(fuzzy_rows)
+    
+    matches = []
+    fill_values = source[FILL_FIELDS].to_numpy()
+    for pos in sorted(found_by_row):
+        source_name, source_email, source_phone = names[pos], emails[pos], phones[pos]
+        row_matches = []
+        for orig_idx in sorted(found_by_row[pos]):
+            target_name, target_email, target_phone = target_keys[orig_idx]
             
-            # Verify we have at least 2 matching fields
-            match_count = 0
+            # Record which fields matched
             matched_fields = []
-            
             if source_name and target_name == source_name:
-                match_count += 1
                 matched_fields.append(f"name: '{source_name}'")
             if source_email and target_email == source_email:
-                match_count += 1
                 matched_fields.append(f"email: '{source_email}'")
             if source_phone and target_phone == source_phone:
-                match_count += 1
                 matched_fields.append(f"phone: '{source_phone}'")
+            if pos in fuzzy_rows:
+                matched_fields.insert(0, f"name ~ '{target_name}'")
+            row_matches.append((orig_idx, " & ".join(matched_fields)))
+        matches.append((tuple(fill_values[pos]), row_matches))
+    
+    return matches
+
+def apply_source_matches(conn, matches, current_values, source_fname, log_file):
+    """Fill missing fields from one source's matches, writing each change to log_file with write_log_rows
+
+    current_values is shared across sources and kept up to date, so earlier files keep priority.
+    Returns (rows updated, fields changed).
+    """
+    updates = 0
+    changes = 0
+    # Filled rows waiting to be written back; current_values always has their latest values
+    pending = {}
+    log_rows = []
+    
+    for fill_values, row_matches in matches:
+        for orig_idx, match_info in row_matches:
+            values = current_values[orig_idx]
+            changed = False
             
-            if match_count >= 2:
-                match_info = " & ".join(matched_fields)
-                changed = False
-                
-                # Update missing fields
-                update_fields = []
-                update_params = []
-                
-                if current_first == '' and src_first and source_row.get(src_first, ''):
-                    update_fields.append("FIRSTNAME = ?")
-                    update_params.append(source_row[src_first])
-                    change_log.append({
-                        'row': int(orig_idx) + 1,
-                        'field': 'FIRSTNAME',
-                        'old_value': '',
-                        'new_value': source_row[src_first],
-                        'source_file': source_fname,
-                        'matched_on': match_info
-                    })
-                    changed = True
-                
-                if current_last == '' and src_last and source_row.get(src_last, ''):
-                    update_fields.append("LASTNAME = ?")
-                    update_params.append(source_row[src_last])
-                    change_log.append({
-                        'row': int(orig_idx) + 1,
-                        'field': 'LASTNAME',
-                        'old_value': '',
-                        'new_value': source_row[src_last],
-                        'source_file': source_fname,
-                        'matched_on': match_info
-                    })
+            # Update missing fields
+            for i, (field, new_value) in enumerate(zip(FILL_FIELDS, fill_values)):
+                if values[i] == '' and new_value:
+                    values[i] = new_value
+                    log_rows.append((int(orig_idx) + 1, field, '', new_value, source_fname, match_info))
+                    changes += 1
                     changed = True
-                
-                if current_email == '' and src_email and source_row.get(src_email, ''):
-                    update_fields.append("X_EMAIL2 = ?")
-                    update_params.append(source_row[src_email])
-                    change_log.append({
-                        'row': int(orig_idx) + 1,
-                        'field': 'X_EMAIL2',
-                        'old_value': '',
-                        'new_value': source_row[src_email],
-                        'source_file': source_fname,
-                        'matched_on': match_info
-                    })
-                    changed = True
-                
-                if current_mobile == '' and src_phones and source_row.get(src_phones[0], ''):
-                    update_fields.append("MOBILE = ?")
-                    update_params.append(source_row[src_phones[0]])
-                    change_log.append({
-                        'row': int(orig_idx) + 1,
-                        'field': 'MOBILE',
-                        'old_value': '',
-                        'new_value': source_row[src_phones[0]],
-                        'source_file': source_fname,
-                        'matched_on': match_info
-                    })
-                    changed = True
-                
-                if changed and update_fields:
-                    update_query = f"UPDATE merged_data SET {', '.join(update_fields)} WHERE orig_index = ?"
-                    update_params.append(orig_idx)
-                    conn.execute(update_query, update_params)
-                    updates += 1
+            
+            if changed:
+                pending[orig_idx] = values
+                updates += 1
+    
+        if len(pending) >= UPDATE_BATCH_SIZE:
+            flush_updates(conn, pending)
     
+    flush_updates(conn, pending)
     conn.commit()
-    conn.close()
-    print(f"Made {updates} updates from {source_fname}")
-    return updates
+    write_log_rows(log_file, log_rows)
+    return updates, changes
 
 def export_updated_database(temp_db_path, output_path):
     """Export the updated database back to TSV format"""
     print(f"Exporting updated database to {output_path}...")
     
-    conn = sqlite3.connect(temp_db_path)
+    conn = connect_temp_db(temp_db_path)
     
     # Get all data except the temporary columns
-    query = """
-    SELECT * FROM merged_data 
-    WHERE rowid IN (
-        SELECT MIN(rowid) FROM merged_data GROUP BY orig_index
-    )
-    ORDER BY orig_index
-    """
+    query = "SELECT * FROM merged_data ORDER BY orig_index"
     
     # Export in chunks to avoid memory issues
     chunk_size = 10000
@@ -266,44 +331,53 @@ def main():
     data_dir = os.path.join(base_dir, 'data_files')
     output_dir = os.path.join(base_dir, 'output')
     merged_path = os.path.join(output_dir, 'MergedDatabase.tsv')
-    log_path = os.path.join(output_dir, 'fill_missing_log.json')
+    log_path = os.path.join(output_dir, 'fill_missing_log.jsonl')
     temp_db_path = os.path.join(output_dir, 'temp_processing.db')
     
     print("=== Large Database Processing Mode ===")
     print("This script is optimized for databases that don't fit in memory")
+    warn_if_no_fuzzy_matching()
     
     # Create temporary SQLite database
     create_temp_database(merged_path, temp_db_path)
     
-    # Process all TSV files
-    change_log = []
-    total_files = len([f for f in os.listdir(data_dir) if f.endswith('.tsv')])
-    processed = 0
+    # Source files are read and normalized in parallel; the parent alone holds the rows that have
+    # gaps and matches each file against them in file order, so earlier files keep priority.
+    # Changes stream to the log one JSON object per line
+    total_changes = 0
+    fnames = [f for f in os.listdir(data_dir) if f.endswith('.tsv')]
+    total_files = len(fnames)
+    workers = max(1, min(total_files, os.cpu_count() or 1))
     
-    for fname in os.listdir(data_dir):
-        if not fname.endswith('.tsv'):
-            continue
+    conn = connect_temp_db(temp_db_path)
+    target_keys, current_values, pair_index = load_missing_rows(conn)
+    
+    print(f"\nWriting change log to {log_path}")
+    with open(log_path, 'w', encoding='utf-8') as log_file, ProcessPoolExecutor(max_workers=workers) as pool:
+        sources = iter_source_files(pool, [os.path.join(data_dir, fname) for fname in fnames], workers)
+        for processed, (fname, source) in enumerate(zip(fnames, sources), 1):
+            print(f"\nProcessing file {processed}/{total_files}: {fname}")
+            print(f"\nProcessing source file: {fname}")
+            if source is None:
+                print(f"Skipping {fname} - missing required columns")
+                continue
             
-        processed += 1
-        print(f"\nProcessing file {processed}/{total_files}: {fname}")
-        src_path = os.path.join(data_dir, fname)
-        
-        updates = process_source_file_chunked(src_path, temp_db_path, fname, change_log)
+            matches = match_source_rows(source, target_keys, pair_index)
+            updates, changes = apply_source_matches(conn, matches, current_values, fname, log_file)
+            total_changes += changes
+            print(f"Made {updates} updates from {fname}")
+    
+    conn.close()
     
     # Export updated database
     export_updated_database(temp_db_path, merged_path)
     
-    # Save change log
-    print(f"\nWriting change log to {log_path}")
-    with open(log_path, 'w') as f:
-        json.dump(change_log, f, indent=2)
-    
     # Clean up temporary database
     print("Cleaning up temporary files...")
     if os.path.exists(temp_db_path):
         os.remove(temp_db_path)
         
-    print(f"\nDone! Made {len(change_log)} total updates across {total_files} files.")
+    print(f"\nDone! Made {total_changes} total updates across {total_files} files.")
     print("Large database processing completed successfully.")
 
 if __name__ == '__main__':
@@ -5,19 +5,6 @@ import logging
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 
-# File paths
-mailchimp_path = "data_sources/mailchimpclean.tsv"
-merged_path = "output/MergedDatabase.tsv"
-output_dir = "output"
-output_path = os.path.join(output_dir, "MergedDatabase.tsv")
-
-# Create output directory if it doesn't exist
-os.makedirs(output_dir, exist_ok=True)
-
-# Load the datasets
-mailchimp_df = pd.read_csv(mailchimp_path, sep='\t', low_memory=False)
-merged_df = pd.read_csv(merged_path, sep='\t', low_memory=False)
-
 # Standardize column names and values (strip, lower)
 def normalize(val):
     if pd.isna(val):
@@ -53,52 +40,84 @@ def get_email(df):
     else:
         return pd.Series([''] * len(df))
 
-mailchimp_df.columns = mailchimp_df.columns.str.strip().str.lower()
-merged_df.columns = merged_df.columns.str.strip().str.lower()
+def is_blank(s):
+    # Missing, falsy or whitespace-only values
+    return s.isna() | s.eq(0) | s.astype(str).str.strip().eq("")
 
-mailchimp_df["name"] = get_name(mailchimp_df)
-merged_df["name"] = get_name(merged_df)
+def has_value(s):
+    return s.notna() & s.astype(bool)
 
-mailchimp_df["mobile"] = get_mobile(mailchimp_df)
-merged_df["mobile"] = get_mobile(merged_df)
+def first_match(source_df, target_df, keys, value_col):
+    # value_col of the first source row sharing each target row's keys (NaN when there is none);
+    # object dtype keeps the source scalars as-is instead of upcasting them around the NaNs
+    lookup = source_df.drop_duplicates(keys).set_index(keys)[value_col].astype(object)
+    matched = lookup.reindex(pd.MultiIndex.from_frame(target_df[keys]))
+    return pd.Series(matched.to_numpy(), index=target_df.index)
 
-mailchimp_df["email"] = get_email(mailchimp_df)
-merged_df["email"] = get_email(merged_df)
+def main():
+    # File paths
+    mailchimp_path = "data_sources/mailchimpclean.tsv"
+    merged_path = "output/MergedDatabase.tsv"
+    output_dir = "output"
+    output_path = os.path.join(output_dir, "MergedDatabase.tsv")
 
-mailchimp_df["name_norm"] = mailchimp_df["name"].apply(normalize)
-mailchimp_df["mobile_norm"] = mailchimp_df["mobile"].apply(normalize)
-mailchimp_df["email_norm"] = mailchimp_df["email"].apply(normalize)
+    # Create output directory if it doesn't exist
+    os.makedirs(output_dir, exist_ok=True)
 
-merged_df["name_norm"] = merged_df["name"].apply(normalize)
-merged_df["mobile_norm"] = merged_df["mobile"].apply(normalize)
-merged_df["email_norm"] = merged_df["email"].apply(normalize)
+    # Load the datasets
+    mailchimp_df = pd.read_csv(mailchimp_path, sep='\t', low_memory=False)
+    merged_df = pd.read_csv(merged_path, sep='\t', low_memory=False)
 
-# Fill missing contact info and log changes (case-insensitive, trimmed, only if full name exists and matches)
-for idx, row in merged_df.iterrows():
-    name = row.get("name_norm")
-    mobile = row.get("mobile_norm")
-    email = row.get("email_norm")
-    if not name:
-        continue  # skip rows with no full name
+    mailchimp_df.columns = mailchimp_df.columns.str.strip().str.lower()
+    merged_df.columns = merged_df.columns.str.strip().str.lower()
 
-    # Fill missing email if full name and mobile match
-    if (not row.get("email")) or pd.isna(row.get("email")) or str(row.get("email")).strip() == "":
-        match = mailchimp_df[(mailchimp_df["name_norm"] == name) & (mailchimp_df["mobile_norm"] == mobile)]
-        if not match.empty and pd.notna(match.iloc[0]["email"]) and match.iloc[0]["email"]:
-            merged_df.at[idx, "email"] = match.iloc[0]["email"]
-            logging.info(f"Filled missing email for '{row.get('name')}' (mobile: {row.get('mobile')}) with '{match.iloc[0]['email']}'")
+    mailchimp_df["name"] = get_name(mailchimp_df)
+    merged_df["name"] = get_name(merged_df)
+
+    mailchimp_df["mobile"] = get_mobile(mailchimp_df)
+    merged_df["mobile"] = get_mobile(merged_df)
+
+    mailchimp_df["email"] = get_email(mailchimp_df)
+    merged_df["email"] = get_email(merged_df)
+
+    mailchimp_df["name_norm"] = mailchimp_df["name"].apply(normalize)
+    mailchimp_df["mobile_norm"] = mailchimp_df["mobile"].apply(normalize)
+    mailchimp_df["email_norm"] = mailchimp_df["email"].apply(normalize)
+
+    merged_df["name_norm"] = merged_df["name"].apply(normalize)
+    merged_df["mobile_norm"] = merged_df["mobile"].apply(normalize)
+    merged_df["email_norm"] = merged_df["email"].apply(normalize)
 
+    # Categorical join keys: each distinct value is stored once and the lookups hash int codes.
+    # Mailchimp keys take the merged categories so codes line up; keys merged lacks become NaN
+    for col in ["name_norm", "mobile_norm", "email_norm"]:
+        merged_df[col] = merged_df[col].astype("category")
+        mailchimp_df[col] = mailchimp_df[col].astype(merged_df[col].dtype)
+
+    # Fill missing contact info and log changes (case-insensitive, trimmed, only if full name exists and matches)
+    # Both fills look up the first Mailchimp row with the same keys and read the merged values as loaded
+    has_name = merged_df["name_norm"] != ""
+    email_match = first_match(mailchimp_df, merged_df, ["name_norm", "mobile_norm"], "email")
+    mobile_match = first_match(mailchimp_df, merged_df, ["name_norm", "email_norm"], "mobile")
+
+    # Fill missing email if full name and mobile match
+    fill_email = has_name & is_blank(merged_df["email"]) & has_value(email_match)
     # Fill missing mobile if full name and email match
-    if (not row.get("mobile")) or pd.isna(row.get("mobile")) or str(row.get("mobile")).strip() == "":
-        match = mailchimp_df[(mailchimp_df["name_norm"] == name) & (mailchimp_df["email_norm"] == email)]
-        if not match.empty and pd.notna(match.iloc[0]["mobile"]) and match.iloc[0]["mobile"]:
-            merged_df.at[idx, "mobile"] = match.iloc[0]["mobile"]
-            logging.info(f"Filled missing mobile for '{row.get('name')}' (email: {row.get('email')}) with '{match.iloc[0]['mobile']}'")
-
-# Drop normalization columns before saving
-merged_df = merged_df.drop(columns=["name_norm", "mobile_norm", "email_norm"])
-
-# Save merged data
-merged_df.to_csv(output_path, sep='\t', index=False)
-logging.info(f"Merged file saved to {output_path}")
-logging.info("Script execution completed successfully.")
\ No newline at end of file
+    fill_mobile = has_name & is_blank(merged_df["mobile"]) & has_value(mobile_match)
+
+    merged_df.loc[fill_email, "email"] = email_match[fill_email]
+    merged_df.loc[fill_mobile, "mobile"] = mobile_match[fill_mobile]
+    logging.info(f"Filled {fill_email.sum()} missing emails (full name and mobile match)")
+    logging.info(f"Filled {fill_mobile.sum()} missing mobiles (full name and email match)")
+
+    # Drop normalization columns before saving
+    merged_df = merged_df.drop(columns=["name_norm", "mobile_norm", "email_norm"])
+
+    # Save merged data
+    merged_df.to_csv(output_path, sep='\t', index=False)
+    logging.info(f"Merged file saved to {output_path}")
+    logging.info("Script execution completed successfully.")
+
+
+if __name__ == "__main__":
+    main()
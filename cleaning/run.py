@@ -7,11 +7,14 @@ Runs the complete contact data processing pipeline in sequence:
 3. validate_fields.py - Validate field formats and data quality
 """
 
-import subprocess
+import contextlib
+import importlib
+import io
 import sys
 import os
 import time
 import logging
+import traceback
 from pathlib import Path
 
 # Setup logging
@@ -22,7 +25,7 @@ logging.basicConfig(
 )
 
 def run_script(script_name, description):
-    """Run a Python script and handle errors"""
+    """Run a pipeline script's main() in this interpreter and handle errors"""
     script_path = Path(__file__).parent / script_name
     
     if not script_path.exists():
@@ -34,41 +37,49 @@ def run_script(script_name, description):
     
     start_time = time.time()
     
+    # Capture the step's output like a child process would: stdout is echoed below,
+    # stderr and its log records are only shown if it fails
+    stdout, stderr = io.StringIO(), io.StringIO()
+    root_logger = logging.getLogger()
+    console_handlers = root_logger.handlers[:]
+    log_handler = logging.StreamHandler(stderr)
+    log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    root_logger.handlers = [log_handler]
+    returncode = 0
+    
     try:
-        # Run the script using the same Python interpreter
-        result = subprocess.run(
-            [sys.executable, str(script_path)],
-            capture_output=True,
-            text=True,
-            cwd=Path(__file__).parent.parent  # Run from project root
-        )
-        
-        end_time = time.time()
-        duration = end_time - start_time
-        
-        # Print the output from the script in real-time style
-        if result.stdout:
-            # Split output into lines and print with indentation
-            for line in result.stdout.strip().split('\n'):
-                if line.strip():  # Only print non-empty lines
-                    print(f"    {line}")
-        
-        if result.returncode == 0:
-            logging.info(f"✅ Completed: {description} (took {duration:.1f}s)")
-            return True
-        else:
-            logging.error(f"❌ Failed: {description}")
-            if result.stderr:
-                logging.error("Error details:")
-                for line in result.stderr.strip().split('\n'):
-                    if line.strip():
-                        logging.error(f"    {line}")
-            return False
-            
-    except Exception as e:
-        end_time = time.time()
-        duration = end_time - start_time
-        logging.error(f"❌ Exception in {description} (after {duration:.1f}s): {e}")
+        module_name = script_path.stem if not __package__ else f"{__package__}.{script_path.stem}"
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            module = importlib.import_module(module_name)
+            if module.main() is False:
+                returncode = 1
+    except SystemExit as e:
+        returncode = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc(file=stderr)
+        returncode = 1
+    finally:
+        root_logger.handlers = console_handlers
+    
+    duration = time.time() - start_time
+    
+    # Print the output from the script in real-time style
+    if stdout.getvalue():
+        # Split output into lines and print with indentation
+        for line in stdout.getvalue().strip().split('\n'):
+            if line.strip():  # Only print non-empty lines
+                print(f"    {line}")
+    
+    if returncode == 0:
+        logging.info(f"✅ Completed: {description} (took {duration:.1f}s)")
+        return True
+    else:
+        logging.error(f"❌ Failed: {description}")
+        if stderr.getvalue():
+            logging.error("Error details:")
+            for line in stderr.getvalue().strip().split('\n'):
+                if line.strip():
+                    logging.error(f"    {line}")
         return False
 
 def main():
@@ -97,11 +108,6 @@ def main():
             logging.error(f"💥 Pipeline failed at step {i}: {description}")
             logging.error("🛑 Stopping pipeline execution")
             sys.exit(1)
-        
-        # Add a small delay between steps
-        if i < len(steps):
-            logging.info("⏳ Preparing for next step...")
-            time.sleep(2)
     
     # Pipeline completed successfully
     pipeline_end = time.time()
@@ -126,7 +132,7 @@ def main():
         if validation_file.exists():
             try:
                 import json
-                with open(validation_file, 'r') as f:
+                with open(validation_file, 'r', encoding='utf-8') as f:
                     validation_errors = json.load(f)
                 
                 if validation_errors:
@@ -1,25 +1,171 @@
 import pandas as pd
+import numpy as np
 import re
 import sys
 import os
 import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 REQUIRED_FIELDS = ["FIRSTNAME", "LASTNAME", "EMAIL"]
 EMAIL_REGEX = r"[^@]+@[^@]+\.[^@]+"
+EMAIL_RE = re.compile(EMAIL_REGEX)
+NONDIGIT_RE = re.compile(r"\D")
 PHONE_FIELDS = [col for col in ["MOBILE", "DIRECTPHONE", "HOMEPHONE"]]
 
+# Inputs larger than this are read and validated in chunks
+LARGE_INPUT_BYTES = 512 * 1024 * 1024
+CHUNK_ROWS = 200_000
+# Phone cells up to this long have their digits counted in one numpy pass
+FAST_DIGITS_WIDTH = 32
+# Lowercased names of the columns validate_frame looks at; chunked reads skip the rest
+VALIDATED_COLUMNS = {"email", "e-mail", "firstname", "lastname", "fullname", "name", "mobile", "directphone", "homephone"}
 
-def validate_email(email):
-    if pd.isna(email) or email == "":
-        return False
-    return bool(re.match(EMAIL_REGEX, str(email).strip()))
+
+def text_values(df, col):
+    """Column rendered the way str(value).strip() renders each cell ('nan' for NaN); '' without a column"""
+    if not col:
+        return pd.Series('', index=df.index)
+    return df[col].astype(str).str.strip()
+
+
+def is_blank_text(values):
+    return values.eq('') | values.str.lower().eq('nan')
 
 
-def validate_phone(phone):
-    if pd.isna(phone) or phone == "":
-        return True  # Allow empty
-    digits = re.sub(r"\D", "", str(phone))
-    return 7 <= len(digits) <= 15
+def is_missing(df, col, values):
+    return df[col].isna() | values.eq('')
+
+
+def digit_counts(values):
+    """len(NONDIGIT_RE.sub('', value)) for each string in values
+
+    Short ASCII values are counted in one numpy pass over their UCS-4 code points;
+    longer or non-ASCII values (e.g. full-width digits) go through the regex.
+    """
+    lengths = values.str.len().to_numpy()
+    short = lengths <= FAST_DIGITS_WIDTH
+    width = max(int(lengths[short].max(initial=0)), 1)
+    codes = values.to_numpy(dtype=object)[short].astype(f"U{width}").view(np.uint32).reshape(-1, width)
+    counts = np.zeros(len(values), dtype=np.int64)
+    # Unsigned subtraction wraps, so only '0'-'9' land below 10 (padding is code point 0)
+    counts[short] = np.count_nonzero(codes - 48 < 10, axis=1)
+    slow = ~short
+    slow[short] = (codes > 127).any(axis=1)
+    if slow.any():
+        counts[slow] = values[slow].str.replace(NONDIGIT_RE, '', regex=True).str.len()
+    return pd.Series(counts, index=values.index)
+
+
+def validate_frame(df):
+    """Validation errors for the rows of one DataFrame, numbered by its index"""
+    # Normalize columns for case-insensitive matching
+    col_map = {col.lower(): col for col in df.columns}
+    email_col = None
+    for possible in ["email", "e-mail", "EMAIL"]:
+        if possible.lower() in col_map:
+            email_col = col_map[possible.lower()]
+            break
+    first_col = col_map.get("firstname", None)
+    last_col = col_map.get("lastname", None)
+    phone_cols = [col_map.get(f.lower(), None) for f in ["MOBILE", "DIRECTPHONE", "HOMEPHONE"] if col_map.get(f.lower(), None)]
+
+    # Every rule is evaluated as a boolean mask over the whole column
+    first_val = text_values(df, first_col)
+    last_val = text_values(df, last_col)
+    if first_col and last_col:
+        full_name = (first_val + ' ' + last_val).str.strip()
+    elif 'fullname' in col_map:
+        full_name = text_values(df, col_map['fullname'])
+    elif 'name' in col_map:
+        full_name = text_values(df, col_map['name'])
+    else:
+        full_name = text_values(df, None)
+
+    email_val = text_values(df, email_col)
+    phone_vals = [text_values(df, phone_field) for phone_field in phone_cols]
+    phone_given = [~is_blank_text(phone_val) for phone_val in phone_vals]
+    # OR the presence masks of every phone column in one pass instead of a branch per column
+    phone_matrix = np.column_stack([given.to_numpy() for given in phone_given]) if phone_given else np.zeros((len(df), 0), dtype=bool)
+    any_phone = pd.Series(phone_matrix.any(axis=1), index=df.index)
+
+    # Skip rows where all fields are missing or name is 'nan nan' or equivalent
+    all_missing = is_blank_text(first_val) & is_blank_text(last_val) & is_blank_text(email_val) & ~any_phone
+    null_name = full_name.eq('') | full_name.str.lower().isin(['nan nan', 'nan'])
+    checked = ~(all_missing | null_name)
+    # Skipped rows never report errors, so drop them before any rule runs
+    if not checked.all():
+        df = df[checked]
+        first_val, last_val, email_val, full_name, any_phone = (
+            values[checked] for values in (first_val, last_val, email_val, full_name, any_phone)
+        )
+        phone_vals = [phone_val[checked] for phone_val in phone_vals]
+        phone_given = [given[checked] for given in phone_given]
+
+    no_rows = pd.Series(False, index=df.index)
+    rules = []
+    # Check required fields
+    rules.append(("Missing FIRSTNAME", is_missing(df, first_col, first_val) if first_col else no_rows))
+    rules.append(("Missing LASTNAME", is_missing(df, last_col, last_val) if last_col else no_rows))
+    if email_col:
+        missing_email = is_missing(df, email_col, email_val)
+        rules.append(("Missing EMAIL", missing_email))
+        # Check email format
+        rules.append(("Invalid email format", ~missing_email & ~email_val.str.match(EMAIL_RE)))
+    else:
+        rules.append(("Missing EMAIL column", ~no_rows))
+
+    # Check phone fields format (MOBILE, DIRECTPHONE, HOMEPHONE)
+    for phone_field, phone_val, given in zip(phone_cols, phone_vals, phone_given):
+        digit_count = digit_counts(phone_val)
+        rules.append((f"Invalid phone in {phone_field}", given & ~digit_count.between(7, 15)))
+    # If no phone number is present, report missing phone
+    rules.append(("Missing phone number (MOBILE, DIRECTPHONE, or HOMEPHONE)", ~any_phone))
+
+    messages = [message for message, _ in rules]
+    failed = np.column_stack([mask.to_numpy() for _, mask in rules])
+
+    # Only report errors if any required field is missing or invalid
+    # (failing rows are read from plain arrays by position, not through the pandas index)
+    row_numbers = df.index.to_numpy()
+    names = full_name.to_numpy()
+    return [
+        {"row": int(row_numbers[i]) + 1, "name": names[i], "errors": [m for m, bad in zip(messages, failed[i]) if bad]}
+        for i in np.flatnonzero(failed.any(axis=1))
+    ]
+
+
+def validate_chunks(chunks):
+    """validate_frame each chunk in worker processes, yielding (chunk rows, errors) in row order
+
+    Only a few chunks are in flight at a time, so memory stays bounded by the worker count.
+    """
+    workers = os.cpu_count() or 1
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks:
+            pending.append((len(chunk), pool.submit(validate_frame, chunk)))
+            if len(pending) > workers:
+                rows, future = pending.popleft()
+                yield rows, future.result()
+        while pending:
+            rows, future = pending.popleft()
+            yield rows, future.result()
+
+
+def dump_error(error):
+    """One report entry, indented the way json.dump(errors, indent=2) indents array elements"""
+    # orjson writes the same indented entries an order of magnitude faster (non-ASCII as UTF-8, not \u escapes)
+    if orjson is not None:
+        text = orjson.dumps(error, option=orjson.OPT_INDENT_2)
+    else:
+        text = json.dumps(error, indent=2).encode()
+    return b"  " + text.replace(b"\n", b"\n  ")
 
 
 def main():
@@ -37,121 +183,74 @@ def main():
     
     print(f"📄 Validating: {input_path}")
     
-    # Read the TSV file
+    # Read the TSV file; inputs too large to load at once are validated chunk by chunk
+    large_input = os.path.getsize(input_path) > LARGE_INPUT_BYTES
     try:
-        df = pd.read_csv(input_path, sep='\t')
-        print(f"📊 Loaded {len(df)} records with {len(df.columns)} columns")
+        if not large_input:
+            df = pd.read_csv(input_path, sep='\t')
+            print(f"📊 Loaded {len(df)} records with {len(df.columns)} columns")
+        else:
+            print(f"📦 Streaming large input in chunks of {CHUNK_ROWS} records")
+            header = pd.read_csv(input_path, sep='\t', nrows=0).columns
+            usecols = [col for col in header if col.lower() in VALIDATED_COLUMNS] or None
+            # Columns are read as text so every chunk gets the same dtypes
+            chunks = pd.read_csv(input_path, sep='\t', dtype=str, usecols=usecols, chunksize=CHUNK_ROWS)
     except Exception as e:
         print(f"❌ Error reading file: {e}")
         sys.exit(1)
     
-    errors = []
-    # Normalize columns for case-insensitive matching
-    col_map = {col.lower(): col for col in df.columns}
-    email_col = None
-    for possible in ["email", "e-mail", "EMAIL"]:
-        if possible.lower() in col_map:
-            email_col = col_map[possible.lower()]
-            break
-    first_col = col_map.get("firstname", None)
-    last_col = col_map.get("lastname", None)
-    phone_cols = [col_map.get(f.lower(), None) for f in ["MOBILE", "DIRECTPHONE", "HOMEPHONE"] if col_map.get(f.lower(), None)]
-
-    for idx, row in df.iterrows():
-        row_errors = []
-        # Compose full name for reporting
-        full_name = ''
-        first_val = str(row.get(first_col, '')).strip() if first_col else ''
-        last_val = str(row.get(last_col, '')).strip() if last_col else ''
-        if first_col and last_col:
-            full_name = f"{first_val} {last_val}".strip()
-        elif 'fullname' in col_map:
-            full_name = str(row.get(col_map['fullname'], '')).strip()
-        elif 'name' in col_map:
-            full_name = str(row.get(col_map['name'], '')).strip()
-
-        email_val = str(row.get(email_col, '')).strip() if email_col else ''
-        phone_vals = [str(row.get(phone_field, '')).strip() if phone_field else '' for phone_field in phone_cols]
-
-        # Check if all fields are missing or name is 'nan nan' or equivalent
-        all_missing = (
-            (first_val == '' or first_val.lower() == 'nan') and
-            (last_val == '' or last_val.lower() == 'nan') and
-            (email_val == '' or email_val.lower() == 'nan') and
-            all(pv == '' or pv.lower() == 'nan' for pv in phone_vals)
-        )
-        null_name = (full_name == '' or full_name.lower() == 'nan nan' or full_name.lower() == 'nan')
-        if all_missing or null_name:
-            continue  # skip this row
-
-        # Check required fields
-        if first_col and (pd.isna(row.get(first_col, '')) or first_val == ""):
-            row_errors.append("Missing FIRSTNAME")
-        if last_col and (pd.isna(row.get(last_col, '')) or last_val == ""):
-            row_errors.append("Missing LASTNAME")
-        if email_col and (pd.isna(row.get(email_col, '')) or email_val == ""):
-            row_errors.append("Missing EMAIL")
-        elif not email_col:
-            row_errors.append("Missing EMAIL column")
-
-        # Check email format
-        if email_col and not pd.isna(row.get(email_col, '')) and email_val != "" and not validate_email(row.get(email_col, '')):
-            row_errors.append("Invalid email format")
-
-        # Check phone fields format (MOBILE, DIRECTPHONE, HOMEPHONE)
-        phone_present = False
-        for i, phone_field in enumerate(phone_cols):
-            if phone_field:
-                phone_val = phone_vals[i]
-                if phone_val != "" and phone_val.lower() != "nan":
-                    phone_present = True
-                    if not validate_phone(phone_val):
-                        row_errors.append(f"Invalid phone in {phone_field}")
-        # If no phone number is present, report missing phone
-        if not phone_present:
-            row_errors.append("Missing phone number (MOBILE, DIRECTPHONE, or HOMEPHONE)")
-
-        # Only report errors if any required field is missing or invalid
-        if row_errors:
-            errors.append({"row": idx+1, "name": full_name, "errors": row_errors})
+    if not large_input:
+        frames = [(len(df), validate_frame(df))]
+    else:
+        # Chunks keep counting rows from the previous one, so row numbers match a full read
+        frames = validate_chunks(chunks)
+    
+    # Stream errors into the JSON report as each frame is validated; only the summary counts stay in memory
+    total_rows = 0
+    error_count = 0
+    first_errors = []
+    # Only fail for critical issues, not data quality issues
+    critical_errors = 0
+    data_quality_errors = 0
+    try:
+        with open(output_path, "wb") as f:
+            f.write(b"[")
+            for frame_rows, frame_errors in frames:
+                total_rows += frame_rows
+                for error in frame_errors:
+                    f.write(b",\n" if error_count else b"\n")
+                    f.write(dump_error(error))
+                    error_count += 1
+                    for err_msg in error['errors']:
+                        if any(critical in err_msg.lower() for critical in ['missing email column', 'invalid email format']):
+                            critical_errors += 1
+                        else:
+                            data_quality_errors += 1
+                first_errors.extend(frame_errors[:10 - len(first_errors)])
+            f.write(b"\n]" if error_count else b"]")
+    except OSError as e:
+        print(f"❌ Error saving validation report: {e}")
+        sys.exit(1)
     
     # Print validation results
     print(f"\n📈 VALIDATION RESULTS:")
-    print(f"   Total rows: {len(df)}")
-    print(f"   Rows with errors: {len(errors)}")
-    print(f"   Success rate: {((len(df) - len(errors)) / len(df) * 100):.1f}%")
+    print(f"   Total rows: {total_rows}")
+    print(f"   Rows with errors: {error_count}")
+    print(f"   Success rate: {((total_rows - error_count) / total_rows * 100):.1f}%")
     
-    if errors:
+    if error_count:
         print(f"\n❌ VALIDATION ERRORS:")
-        for err in errors[:10]:  # Show first 10 errors
+        for err in first_errors:  # Show first 10 errors
             print(f"   Row {err['row']} ({err['name']}): {', '.join(err['errors'])}")
         
-        if len(errors) > 10:
-            print(f"   ... and {len(errors) - 10} more errors")
+        if error_count > 10:
+            print(f"   ... and {error_count - 10} more errors")
     else:
         print("\n✅ All rows passed validation!")
     
-    # Save errors to JSON file
-    try:
-        with open(output_path, "w") as f:
-            json.dump(errors, f, indent=2)
-        print(f"\n📄 Validation report saved to: {output_path}")
-    except Exception as e:
-        print(f"❌ Error saving validation report: {e}")
-        sys.exit(1)
+    print(f"\n📄 Validation report saved to: {output_path}")
         
     # Determine if validation should be considered successful
-    # Only fail for critical issues, not data quality issues
-    critical_errors = 0
-    data_quality_errors = 0
-    
-    for error in errors:
-        for err_msg in error['errors']:
-            if any(critical in err_msg.lower() for critical in ['missing email column', 'invalid email format']):
-                critical_errors += 1
-            else:
-                data_quality_errors += 1
-    
     if critical_errors > 0:
         print(f"\n❌ Found {critical_errors} critical validation errors!")
         return False
@@ -1,7 +1,10 @@
 import re
 
+EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+NONDIGIT_RE = re.compile(r"\D+")
+
 def is_valid_email(email):
-    return re.match(r"[^@]+@[^@]+\.[^@]+", email)
+    return EMAIL_RE.match(email)
 
 def is_valid_phone(phone):
-    return len(re.sub(r"\D", "", phone)) >= 8
+    return len(NONDIGIT_RE.sub("", phone)) >= 8